@@ -0,0 +1,55 @@
+import asyncio
+from sqlalchemy import func, or_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from .models import Topic, Comment
+
+# Topic.comment_count and Topic.last_activity_at are kept current by the
+# comment writes in CRUDOperations. This backfills them after the migration
+# that adds them and repairs any drift, one range of topic ids per transaction
+# so a large table is never locked as a whole.
+RECONCILE_BATCH_SIZE = 5000
+
+
+async def reconcile_topic_counters(db: AsyncSession, batch_size: int = RECONCILE_BATCH_SIZE) -> int:
+    fixed = 0
+    last_id = 0
+    max_id = (await db.execute(select(func.max(Topic.id)))).scalar() or 0
+    while last_id < max_id:
+        upper = last_id + batch_size
+        # Lock the batch before counting, otherwise a concurrent comment_count + 1
+        # can be overwritten by a count whose snapshot missed that comment. A
+        # comment in flight holds its topic's row lock until it commits, so the
+        # UPDATE below (a new snapshot) sees it, and later ones wait for ours.
+        await db.execute(
+            select(Topic.id).where(Topic.id > last_id, Topic.id <= upper).order_by(Topic.id).with_for_update()
+        )
+        # Counted per topic on the (topic_id, id) index
+        actual = select(func.count(Comment.id)).where(Comment.topic_id == Topic.id).scalar_subquery()
+        latest = select(func.max(Comment.created_at)).where(Comment.topic_id == Topic.id).scalar_subquery()
+        result = await db.execute(
+            update(Topic)
+            .where(Topic.id > last_id, Topic.id <= upper)
+            .where(or_(Topic.comment_count != actual, Topic.last_activity_at.is_(None)))
+            .values(
+                comment_count=actual,
+                last_activity_at=func.coalesce(Topic.last_activity_at, latest, Topic.created_at, func.timezone('utc', func.now())),
+            )
+            .execution_options(synchronize_session=False)
+        )
+        await db.commit()
+        fixed += result.rowcount
+        last_id = upper
+    return fixed
+
+
+async def main():
+    from .database import SessionLocal
+    async with SessionLocal() as db:
+        fixed = await reconcile_topic_counters(db)
+    print(f"Reconciled comment counters of {fixed} topics")
+
+
+if __name__ == "__main__":
+    # Backfill / reconciliation job: python -m Backend.database.counters
+    asyncio.run(main())
@@ -0,0 +1,48 @@
+"""Full-text search columns and their GIN indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+
+Adding a stored generated column rewrites the table under an exclusive lock.
+Databases built by create_all after full-text search was introduced already
+have the columns and indexes, IF NOT EXISTS leaves those untouched.
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0002"
+down_revision: Union[str, None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# table -> generated tsvector expression, the same as on the models
+SEARCH_VECTORS = {
+    # Title matches rank above content matches
+    "topics": (
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(content, '')), 'B')"
+    ),
+    "comments": "to_tsvector('english', coalesce(content, ''))",
+}
+
+
+def upgrade() -> None:
+    for table, expression in SEARCH_VECTORS.items():
+        op.execute(
+            f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS search_vector tsvector "
+            f"GENERATED ALWAYS AS ({expression}) STORED"
+        )
+    with op.get_context().autocommit_block():
+        for table in SEARCH_VECTORS:
+            op.create_index(f"ix_{table}_search_vector", table, ["search_vector"], postgresql_using="gin",
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for table in SEARCH_VECTORS:
+            op.drop_index(f"ix_{table}_search_vector", table_name=table, postgresql_concurrently=True, if_exists=True)
+    for table in SEARCH_VECTORS:
+        op.drop_column(table, "search_vector")
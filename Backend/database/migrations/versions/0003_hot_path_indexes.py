@@ -0,0 +1,58 @@
+"""Indexes for the hot queries, built concurrently
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0003"
+down_revision: Union[str, None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# name, table, columns, options; each one is declared on its model as well
+INDEXES = [
+    # A user's topics in id order (User.topics loader, /topics/{user_name}, userTopics)
+    ("ix_topics_user_id_id", "topics", ["user_id", "id"], {}),
+    # topic(prefix) runs title LIKE 'prefix%', which a default-collation btree cannot serve
+    ("ix_topics_title_pattern", "topics", ["title"], {"postgresql_ops": {"title": "varchar_pattern_ops"}}),
+    # Comment pages of a topic by id (comments connection, Topic.comments, delete_topic)
+    ("ix_comments_topic_id_id", "comments", ["topic_id", "id"], {}),
+    # A user's comments (delete_user)
+    ("ix_comments_user_id", "comments", ["user_id"], {}),
+    # Notification pages newest first, read backwards (/notifications/all, inbox rebuild)
+    ("ix_notifications_user_id_created_at_id", "notifications", ["user_id", "created_at", "id"], {}),
+    # Unread pages, unread counts and mark-read only ever touch unread rows
+    ("ix_notifications_unread", "notifications", ["user_id", "created_at", "id"],
+     {"postgresql_where": sa.text("is_read = false")}),
+]
+
+
+def _drop_if_invalid(name: str):
+    # A failed concurrent build leaves an INVALID index behind, which
+    # IF NOT EXISTS would otherwise keep forever
+    if op.get_context().as_sql:
+        return
+    invalid = op.get_bind().execute(
+        sa.text("SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(:name)"), {"name": name}
+    ).scalar()
+    if invalid:
+        op.drop_index(name, postgresql_concurrently=True, if_exists=True)
+
+
+def upgrade() -> None:
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction, and does not
+    # block writes to the table while it builds
+    with op.get_context().autocommit_block():
+        for name, table, columns, options in INDEXES:
+            _drop_if_invalid(name)
+            op.create_index(name, table, columns, postgresql_concurrently=True, if_not_exists=True, **options)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
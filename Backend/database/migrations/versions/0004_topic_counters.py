@@ -0,0 +1,36 @@
+"""Denormalised comment_count and last_activity_at on topics
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+
+Backfill afterwards with python -m Backend.database.counters, it works in
+small batches while the application keeps running.
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "0004"
+down_revision: Union[str, None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # A constant default is stored in the catalog, so neither column rewrites the table
+    op.add_column("topics", sa.Column("comment_count", sa.Integer(), nullable=False, server_default=sa.text("0")))
+    op.add_column("topics", sa.Column("last_activity_at", sa.DateTime(), nullable=True))
+    with op.get_context().autocommit_block():
+        op.create_index("ix_topics_comment_count_id", "topics", ["comment_count", "id"],
+                        postgresql_concurrently=True, if_not_exists=True)
+        op.create_index("ix_topics_last_activity_at_id", "topics", ["last_activity_at", "id"],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_topics_last_activity_at_id", table_name="topics", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_topics_comment_count_id", table_name="topics", postgresql_concurrently=True, if_exists=True)
+    op.drop_column("topics", "last_activity_at")
+    op.drop_column("topics", "comment_count")
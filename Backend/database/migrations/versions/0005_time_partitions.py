@@ -0,0 +1,175 @@
+"""Topic timestamps, comments and notifications partitioned by month
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+
+Needs a maintenance window: comments and notifications are copied into new
+partitioned tables under an exclusive lock, so stop the API and the
+notification consumer first. Existing comments and topics have no creation
+time on record and get the time of the upgrade.
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "0005"
+down_revision: Union[str, None] = "0004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+NOW = "timezone('utc', now())"
+
+# Creates the missing monthly partitions {parent}_YYYY_MM covering first_month
+# through last_month and returns how many it created. Called by
+# Backend/database/partitions.py, the advisory lock keeps API workers and
+# consumers that start together from racing each other.
+CREATE_MONTH_PARTITIONS = """
+CREATE OR REPLACE FUNCTION create_month_partitions(parent text, first_month date, last_month date)
+RETURNS integer LANGUAGE plpgsql AS $$
+DECLARE
+    month date := date_trunc('month', first_month)::date;
+    partition text;
+    created integer := 0;
+BEGIN
+    PERFORM pg_advisory_xact_lock(hashtext('create_month_partitions:' || parent));
+    WHILE month <= last_month LOOP
+        partition := parent || '_' || to_char(month, 'YYYY_MM');
+        IF to_regclass(partition) IS NULL THEN
+            EXECUTE format('CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+                           partition, parent, month, (month + interval '1 month')::date);
+            created := created + 1;
+        END IF;
+        month := (month + interval '1 month')::date;
+    END LOOP;
+    RETURN created;
+END
+$$
+"""
+
+
+def _set_aside(table: str, indexes: Sequence[str]) -> None:
+    # Keeps the old table and its sequence for the copy, freeing the index names
+    op.execute(f"LOCK TABLE {table} IN ACCESS EXCLUSIVE MODE")
+    for index in indexes:
+        op.drop_index(index, table_name=table, if_exists=True)
+    op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {table}_pkey TO {table}_legacy_pkey")
+    op.rename_table(table, f"{table}_legacy")
+
+
+def _copy_from_legacy(table: str, columns: str, values: str) -> None:
+    op.execute(f"INSERT INTO {table} ({columns}) SELECT {values} FROM {table}_legacy")
+    # New ids keep coming from the same sequence
+    op.execute(f"ALTER SEQUENCE {table}_id_seq OWNED BY {table}.id")
+    op.drop_table(f"{table}_legacy")
+
+
+def upgrade() -> None:
+    op.execute(CREATE_MONTH_PARTITIONS)
+
+    # A stable default is stored in the catalog, so existing topics get the
+    # upgrade time without a table rewrite; new rows get theirs from the ORM
+    op.add_column("topics", sa.Column("created_at", sa.DateTime(), nullable=True, server_default=sa.text(NOW)))
+    op.alter_column("topics", "created_at", server_default=None)
+
+    _set_aside("comments", ["ix_comments_id", "ix_comments_search_vector", "ix_comments_topic_id_id", "ix_comments_user_id"])
+    op.create_table(
+        "comments",
+        sa.Column("id", sa.Integer(), nullable=False, server_default=sa.text("nextval('comments_id_seq')")),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("topic_id", sa.Integer(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("search_vector", postgresql.TSVECTOR(), sa.Computed(
+            "to_tsvector('english', coalesce(content, ''))", persisted=True,
+        ), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    op.execute(f"SELECT create_month_partitions('comments', ({NOW})::date, ({NOW} + interval '3 months')::date)")
+    _copy_from_legacy("comments", "id, user_id, topic_id, content, created_at", f"id, user_id, topic_id, content, {NOW}")
+
+    _set_aside("notifications", ["ix_notifications_id", "ix_notifications_user_id_created_at_id", "ix_notifications_unread"])
+    op.create_table(
+        "notifications",
+        sa.Column("id", sa.Integer(), nullable=False, server_default=sa.text("nextval('notifications_id_seq')")),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("message", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("is_read", sa.Boolean(), nullable=True),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    op.execute(
+        "SELECT create_month_partitions('notifications', "
+        f"coalesce(min(created_at), {NOW})::date, ({NOW} + interval '3 months')::date) FROM notifications_legacy"
+    )
+    _copy_from_legacy(
+        "notifications", "id, user_id, message, created_at, is_read",
+        f"id, user_id, message, coalesce(created_at, {NOW}), is_read",
+    )
+
+    # Keys and indexes are built once the rows are in, on the parent so that
+    # every partition, including those created later, gets its own copy
+    op.create_primary_key("comments_pkey", "comments", ["id", "created_at"])
+    op.create_foreign_key("comments_user_id_fkey", "comments", "users", ["user_id"], ["id"])
+    op.create_foreign_key("comments_topic_id_fkey", "comments", "topics", ["topic_id"], ["id"])
+    op.create_index("ix_comments_search_vector", "comments", ["search_vector"], postgresql_using="gin")
+    op.create_index("ix_comments_topic_id_id", "comments", ["topic_id", "id"])
+    op.create_index("ix_comments_user_id", "comments", ["user_id"])
+    op.create_index("ix_comments_created_at_id", "comments", ["created_at", "id"])
+
+    op.create_primary_key("notifications_pkey", "notifications", ["id", "created_at"])
+    op.create_foreign_key("notifications_user_id_fkey", "notifications", "users", ["user_id"], ["id"])
+    op.create_index("ix_notifications_user_id_created_at_id", "notifications", ["user_id", "created_at", "id"])
+    op.create_index("ix_notifications_unread", "notifications", ["user_id", "created_at", "id"],
+                    postgresql_where=sa.text("is_read = false"))
+
+    with op.get_context().autocommit_block():
+        op.create_index("ix_topics_created_at_id", "topics", ["created_at", "id"],
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_topics_created_at_id", table_name="topics", postgresql_concurrently=True, if_exists=True)
+
+    # Back to plain tables, dropping the partitioned ones drops their partitions
+    _set_aside("notifications", ["ix_notifications_user_id_created_at_id", "ix_notifications_unread"])
+    op.create_table(
+        "notifications",
+        sa.Column("id", sa.Integer(), nullable=False, server_default=sa.text("nextval('notifications_id_seq')")),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("message", sa.String(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("is_read", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+    )
+    _copy_from_legacy("notifications", "id, user_id, message, created_at, is_read", "id, user_id, message, created_at, is_read")
+    op.create_primary_key("notifications_pkey", "notifications", ["id"])
+    op.create_index("ix_notifications_id", "notifications", ["id"])
+    op.create_index("ix_notifications_user_id_created_at_id", "notifications", ["user_id", "created_at", "id"])
+    op.create_index("ix_notifications_unread", "notifications", ["user_id", "created_at", "id"],
+                    postgresql_where=sa.text("is_read = false"))
+
+    _set_aside("comments", ["ix_comments_search_vector", "ix_comments_topic_id_id", "ix_comments_user_id", "ix_comments_created_at_id"])
+    op.create_table(
+        "comments",
+        sa.Column("id", sa.Integer(), nullable=False, server_default=sa.text("nextval('comments_id_seq')")),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("topic_id", sa.Integer(), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("search_vector", postgresql.TSVECTOR(), sa.Computed(
+            "to_tsvector('english', coalesce(content, ''))", persisted=True,
+        ), nullable=True),
+        sa.ForeignKeyConstraint(["topic_id"], ["topics.id"]),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+    )
+    _copy_from_legacy("comments", "id, user_id, topic_id, content", "id, user_id, topic_id, content")
+    op.create_primary_key("comments_pkey", "comments", ["id"])
+    op.create_index("ix_comments_id", "comments", ["id"])
+    op.create_index("ix_comments_search_vector", "comments", ["search_vector"], postgresql_using="gin")
+    op.create_index("ix_comments_topic_id_id", "comments", ["topic_id", "id"])
+    op.create_index("ix_comments_user_id", "comments", ["user_id"])
+
+    op.drop_column("topics", "created_at")
+    op.execute("DROP FUNCTION IF EXISTS create_month_partitions(text, date, date)")
@@ -1,5 +1,6 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Boolean
-from sqlalchemy.orm import declarative_base, relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, Text, DateTime, Boolean, Computed, Index, text
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import declarative_base, relationship, deferred
 from datetime import datetime
 
 
@@ -20,33 +21,72 @@ class User(Base):
 
 class Topic(Base):
     __tablename__ = 'topics'
-    __table_args__ = {'extend_existing': True}
+    __table_args__ = (
+        Index('ix_topics_search_vector', 'search_vector', postgresql_using='gin'),
+        Index('ix_topics_user_id_id', 'user_id', 'id'),
+        # title LIKE 'prefix%' needs pattern ops outside the C locale
+        Index('ix_topics_title_pattern', 'title', postgresql_ops={'title': 'varchar_pattern_ops'}),
+        # "Most commented" and "recently active" lists, read backwards
+        Index('ix_topics_comment_count_id', 'comment_count', 'id'),
+        Index('ix_topics_last_activity_at_id', 'last_activity_at', 'id'),
+        Index('ix_topics_created_at_id', 'created_at', 'id'),
+        {'extend_existing': True},
+    )
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     title = Column(String(255), nullable=False)
     content = Column(Text, nullable=False)
+    # Full-text search document maintained by Postgres, title matches rank above content matches.
+    # Deferred so ordinary topic queries never load it.
+    search_vector = deferred(Column(TSVECTOR, Computed(
+        "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(content, '')), 'B')",
+        persisted=True,
+    )))
 
-    # created_at = Column(DateTime, default=datetime.utcnow)  # Timestamp for the topic creation
+    # Maintained by CRUDOperations in the same transaction as the comment writes,
+    # python -m Backend.database.counters reconciles them with the comments table
+    comment_count = Column(Integer, nullable=False, default=0, server_default=text('0'))
+    last_activity_at = Column(DateTime, default=datetime.utcnow)  # Creation or latest comment
+    created_at = Column(DateTime, default=datetime.utcnow)  # Timestamp for the topic creation
     owner = relationship("User", back_populates="topics")
     comments = relationship("Comment", back_populates="topic")
 
 class Comment(Base):
     __tablename__ = 'comments'
-    __table_args__ = {'extend_existing': True}
-    id = Column(Integer, primary_key=True, index=True)
+    __table_args__ = (
+        Index('ix_comments_search_vector', 'search_vector', postgresql_using='gin'),
+        # Serves both comment lookups by topic and keyset pages ordered by id
+        Index('ix_comments_topic_id_id', 'topic_id', 'id'),
+        Index('ix_comments_user_id', 'user_id'),
+        Index('ix_comments_created_at_id', 'created_at', 'id'),
+        # One partition per month, see Backend/database/partitions.py. Postgres
+        # requires the partition key in every unique constraint, hence the
+        # (id, created_at) primary key; ids still come from a single sequence.
+        {'extend_existing': True, 'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    created_at = Column(DateTime, primary_key=True, nullable=False, default=datetime.utcnow)  # Timestamp for the comment
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     topic_id = Column(Integer, ForeignKey('topics.id'), nullable=False)
     content = Column(Text, nullable=False)
+    search_vector = deferred(Column(TSVECTOR, Computed("to_tsvector('english', coalesce(content, ''))", persisted=True)))
     author = relationship("User", back_populates="comments")
     topic = relationship("Topic", back_populates="comments")
 
 class Notification(Base):
     __tablename__ = "notifications"
-    __table_args__ = {'extend_existing': True}
-    id = Column(Integer, primary_key=True, index=True)
+    __table_args__ = (
+        # Pages are read newest first by scanning these backwards
+        Index('ix_notifications_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+        Index('ix_notifications_unread', 'user_id', 'created_at', 'id', postgresql_where=text('is_read = false')),
+        # Monthly partitions like comments
+        {'extend_existing': True, 'postgresql_partition_by': 'RANGE (created_at)'},
+    )
+    id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)  # The user who will receive the notification
     message = Column(String, nullable=False)  # The notification message
-    created_at = Column(DateTime, default=datetime.utcnow)  # Timestamp for the notification
+    created_at = Column(DateTime, primary_key=True, nullable=False, default=datetime.utcnow)  # Timestamp for the notification
     is_read = Column(Boolean, default=False)  # Flag to indicate if the notification has
 
     user = relationship("User", back_populates="notifications")
\ No newline at end of file
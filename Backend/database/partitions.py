@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import os
+from datetime import date, datetime
+from typing import List, Tuple
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# comments and notifications are range partitioned by created_at, one
+# partition per month named {table}_YYYY_MM (see migration 0005). Inserts into
+# a month without a partition fail, so partitions are created a few months
+# ahead, at startup and then periodically, by the create_month_partitions()
+# SQL function. Old months leave the table by detaching them, which is a
+# catalog change instead of a DELETE over millions of rows:
+#   python -m Backend.database.partitions --detach-before 2025-01 [--drop]
+PARTITIONED_TABLES = ("comments", "notifications")
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "3"))
+PARTITION_CHECK_INTERVAL = 12 * 3600    # seconds between checks for the months ahead
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_month(name: str) -> date:
+    # comments_2026_10 -> 2026-10-01
+    year, month = name.rsplit("_", 2)[-2:]
+    return date(int(year), int(month), 1)
+
+
+async def ensure_partitions(db: AsyncSession, months_ahead: int = PARTITION_MONTHS_AHEAD) -> int:
+    this_month = datetime.utcnow().date().replace(day=1)
+    created = 0
+    for table in PARTITIONED_TABLES:
+        created += (await db.execute(
+            text("SELECT create_month_partitions(:parent, :first_month, :last_month)"),
+            {"parent": table, "first_month": this_month, "last_month": add_months(this_month, months_ahead)},
+        )).scalar()
+    await db.commit()
+    return created
+
+
+async def maintain_partitions(session_factory):
+    # Background task: keeps PARTITION_MONTHS_AHEAD months of partitions ready
+    while True:
+        try:
+            async with session_factory() as db:
+                created = await ensure_partitions(db)
+            if created:
+                print(f"Created {created} partitions")
+            await asyncio.sleep(PARTITION_CHECK_INTERVAL)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Partition maintenance error: {e}")
+            await asyncio.sleep(60)
+
+
+async def list_partitions(conn, table: str) -> List[Tuple[str, date]]:
+    rows = (await conn.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = CAST(:parent AS regclass) ORDER BY c.relname"
+        ),
+        {"parent": table},
+    )).scalars().all()
+    return [(name, partition_month(name)) for name in rows]
+
+
+async def detach_partitions(engine, before: date, drop: bool = False) -> List[str]:
+    # DETACH ... CONCURRENTLY cannot run inside a transaction block. It only
+    # waits for queries already reading the partition, inserts and reads of
+    # the other months carry on.
+    detached = []
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        for table in PARTITIONED_TABLES:
+            for name, month in await list_partitions(conn, table):
+                if month >= before:
+                    continue
+                await conn.execute(text(f'ALTER TABLE "{table}" DETACH PARTITION "{name}" CONCURRENTLY'))
+                if drop:
+                    await conn.execute(text(f'DROP TABLE "{name}"'))
+                detached.append(name)
+    return detached
+
+
+async def main():
+    from .database import SessionLocal, engine
+    parser = argparse.ArgumentParser(description="Create and retire the monthly comment and notification partitions")
+    parser.add_argument("--months-ahead", type=int, default=PARTITION_MONTHS_AHEAD)
+    parser.add_argument("--detach-before", type=lambda value: datetime.strptime(value, "%Y-%m").date(),
+                        help="detach every partition of a month before this one (YYYY-MM)")
+    parser.add_argument("--drop", action="store_true", help="drop the detached partitions instead of keeping them as tables")
+    args = parser.parse_args()
+
+    async with SessionLocal() as db:
+        created = await ensure_partitions(db, args.months_ahead)
+    print(f"Created {created} partitions")
+    if args.detach_before:
+        detached = await detach_partitions(engine, args.detach_before, args.drop)
+        print(f"{'Dropped' if args.drop else 'Detached'} {len(detached)} partitions: {', '.join(detached) or '-'}")
+
+
+if __name__ == "__main__":
+    # Partition maintenance: python -m Backend.database.partitions
+    asyncio.run(main())
@@ -0,0 +1,185 @@
+import asyncio
+import math
+import os
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from jose import JWTError, jwt
+from starlette.responses import JSONResponse
+from .auth import SECRET_KEY, ALGORITHM
+from ..redis.redis import RedisCache
+
+# Admission control in front of every HTTP route, in two steps:
+# 1. Token buckets in Redis, shared by all workers: one per user, one per IP
+#    and one for the whole route class. Anonymous requests only have the IP
+#    bucket, sized for ip_multiplier users behind one address, and the route one.
+#    An empty bucket answers 429 with Retry-After.
+# 2. A per-worker cap on requests in flight per route class. Requests over it
+#    wait up to max_wait for a slot, at most max_queue of them, then get 503.
+# The expensive classes get small budgets so they cannot take every database
+# connection and bcrypt worker away from the cheap ones.
+
+
+class RouteClass(NamedTuple):
+    prefixes: Tuple[str, ...]
+    rate: float            # tokens per second per user
+    burst: int             # bucket size, requests allowed at once after idling
+    ip_multiplier: int     # an IP may carry this many users' worth (shared NATs, proxies)
+    route_rate: float      # tokens per second for the class across all clients, burst of one second
+    max_in_flight: int     # concurrent requests per worker
+    max_queue: int         # requests waiting for a slot per worker
+    max_wait: float        # seconds a request may wait for a slot
+
+
+ROUTE_CLASSES: Dict[str, RouteClass] = {
+    # bcrypt bound, see passwords.py
+    "login": RouteClass(("/auth/token", "/auth/register", "/auth/update-password"), 0.2, 5, 4, 50, 8, 32, 2.0),
+    # Token rotation and revocation: no bcrypt, but a session only needs one every few minutes
+    "token": RouteClass(("/auth/refresh", "/auth/logout"), 1, 10, 4, 200, 16, 64, 1.0),
+    "graphql": RouteClass(("/graphql",), 5, 20, 4, 500, 16, 64, 1.0),
+    "search": RouteClass(("/api/search",), 5, 20, 4, 500, 16, 64, 1.0),
+    "default": RouteClass((), 20, 60, 4, 2000, 64, 256, 2.0),
+}
+
+RATE_LIMIT_PREFIX = "ratelimit:"
+# Seconds the limiter may take before the request is admitted without it
+RATE_LIMIT_TIMEOUT = float(os.getenv("RATE_LIMIT_TIMEOUT", "0.1"))
+
+# Checks every bucket before taking a token from any, so a request refused by
+# one bucket does not drain the others. Returns 0 when admitted, otherwise the
+# milliseconds until the emptiest bucket holds a token again.
+# KEYS: buckets, ARGV[1]: now in ms, then (rate per second, capacity) per bucket
+TOKEN_BUCKET_SCRIPT = """
+local now = tonumber(ARGV[1])
+local wait = 0
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local capacity = tonumber(ARGV[2 * i + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate / 1000)
+    levels[i] = tokens
+    if tokens < 1 then
+        wait = math.max(wait, math.ceil((1 - tokens) * 1000 / rate))
+    end
+end
+if wait > 0 then
+    return wait
+end
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[2 * i])
+    local capacity = tonumber(ARGV[2 * i + 1])
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - 1), 'ts', now)
+    redis.call('PEXPIRE', key, math.ceil(capacity * 1000 / rate) + 1000)
+end
+return 0
+"""
+
+
+def classify(path: str) -> str:
+    for name, route_class in ROUTE_CLASSES.items():
+        if any(path.startswith(prefix) for prefix in route_class.prefixes):
+            return name
+    return "default"
+
+
+def token_subject(headers: List[Tuple[bytes, bytes]]) -> Optional[str]:
+    # Verified, so a forged token cannot move its requests into someone else's bucket
+    for name, value in headers:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer" or not token:
+                return None
+            try:
+                return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM]).get("sub")
+            except JWTError:
+                return None
+    return None
+
+
+class RouteGate:
+    # Per-worker in-flight cap with a bounded, deadline-limited wait
+    def __init__(self, route_class: RouteClass):
+        self.route_class = route_class
+        self.slots = asyncio.Semaphore(route_class.max_in_flight)
+        self.waiting = 0
+
+    async def acquire(self) -> bool:
+        if not self.slots.locked():
+            await self.slots.acquire()
+            return True
+        if self.waiting >= self.route_class.max_queue:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), self.route_class.max_wait)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+
+    def release(self):
+        self.slots.release()
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self.gates = {name: RouteGate(route_class) for name, route_class in ROUTE_CLASSES.items()}
+        # Runs on every request: the asyncio client keeps a slow Redis from
+        # stalling the event loop and the whole worker with it
+        self.redis_client = RedisCache().async_client
+        self._take = self.redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    async def retry_after(self, name: str, scope) -> int:
+        # Seconds until the request may be admitted, 0 when it is admitted now
+        route_class = ROUTE_CLASSES[name]
+        ip = scope["client"][0] if scope.get("client") else "unknown"
+        subject = token_subject(scope["headers"])
+        buckets = [
+            (f"{RATE_LIMIT_PREFIX}{name}:ip:{ip}", route_class.rate * route_class.ip_multiplier,
+             route_class.burst * route_class.ip_multiplier),
+            (f"{RATE_LIMIT_PREFIX}{name}:route", route_class.route_rate, max(1, math.ceil(route_class.route_rate))),
+        ]
+        if subject is not None:
+            buckets.append((f"{RATE_LIMIT_PREFIX}{name}:user:{subject}", route_class.rate, route_class.burst))
+        args = [int(time.time() * 1000)]
+        for _, rate, capacity in buckets:
+            args += [rate, capacity]
+        try:
+            wait_ms = await asyncio.wait_for(
+                self._take(keys=[key for key, _, _ in buckets], args=args), RATE_LIMIT_TIMEOUT
+            )
+        except Exception as e:
+            # Fail open: losing Redis must not take the whole API down with it
+            print(f"Rate limiter unavailable: {e!r}")
+            return 0
+        return math.ceil(wait_ms / 1000) if wait_ms else 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        name = classify(scope["path"])
+        retry_after = await self.retry_after(name, scope)
+        if retry_after:
+            response = JSONResponse(
+                {"detail": "Too many requests"}, status_code=429, headers={"Retry-After": str(retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        gate = self.gates[name]
+        if not await gate.acquire():
+            response = JSONResponse(
+                {"detail": "Server busy, retry shortly"}, status_code=503, headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
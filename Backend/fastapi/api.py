@@ -1,12 +1,15 @@
-from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, File, UploadFile
+from fastapi import FastAPI, APIRouter, Depends, HTTPException, status, File, UploadFile, Query
 from pydantic import BaseModel, HttpUrl
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import update
+from typing import List, Literal, Optional
 import aiohttp
 from .auth import get_current_user
-from .operations import CRUDOperations, SearchOperations, TopicCreate, CommentCreate
+from .operations import after_commit, CRUDOperations, SearchOperations, TopicCreate, CommentCreate, MarkRead, NOTIFICATION_PAGE_SIZE, MAX_NOTIFICATION_PAGE_SIZE, SEARCH_PAGE_SIZE, MAX_SEARCH_PAGE_SIZE, FEED_PAGE_SIZE, MAX_FEED_PAGE_SIZE
 from ..database.database import get_db
 from ..database.models import User as Usermodel
+from ..redis.redis import RedisCache
+from ..redis.principals import principal_cache
 # from ..utils.trending import get_trending_topics
 
 
@@ -38,71 +41,112 @@ class ProfileImageUpdate(BaseModel):
     image_url: HttpUrl
     
 @router.get("/forum")
-def root():
+async def root():
     return {"message": "Welcome to the real time forum!"}
 
 # Add topics
 @router.post("/topics")
-def create_topic(topic: TopicCreate, db=Depends(get_db), current_user=Depends(get_current_user)):
-    return CRUDOperations.create_topic(topic, db, current_user)
+async def create_topic(topic: TopicCreate, db=Depends(get_db), current_user=Depends(get_current_user)):
+    return await CRUDOperations.create_topic(topic, db, current_user)
 
 # Add comments
 @router.post("/comments/{topic_id}")
-def add_comment(topic_id: int, comment: CommentCreate, db=Depends(get_db), current_user=Depends(get_current_user)):
-    return CRUDOperations.add_comment(comment, db, current_user)
+async def add_comment(topic_id: int, comment: CommentCreate, db=Depends(get_db), current_user=Depends(get_current_user)):
+    return await CRUDOperations.add_comment(comment, db, current_user)
+
+# Most recent or most commented topics, declared before /topics/{user_name} so "feed" is not taken as a name
+@router.get("/topics/feed")
+async def get_feed(
+    kind: Literal["recent", "active"] = "recent",
+    limit: int = Query(FEED_PAGE_SIZE, ge=1, le=MAX_FEED_PAGE_SIZE),
+    current_user=Depends(get_current_user)
+):
+    return await SearchOperations.get_feed(kind, current_user, limit)
 
 @router.get("/topics/{user_name}")
-def get_topics_username(user_name: str, db=Depends(get_db), current_user=Depends(get_current_user)):
-    return SearchOperations.get_topics_username(user_name, db, current_user)
+async def get_topics_username(user_name: str, db=Depends(get_db), current_user=Depends(get_current_user)):
+    return await SearchOperations.get_topics_username(user_name, db, current_user)
+
+
 
 
 
+# Full-text search over topics or comments, ranked with ts_rank
+@router.get("/search")
+async def search(
+    q: str = Query(..., min_length=1),
+    scope: Literal["topics", "comments"] = "topics",
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    if scope == "comments":
+        return await SearchOperations.search_comments(q, db, current_user, limit, offset)
+    return await SearchOperations.search_topics(q, db, current_user, limit, offset)
+
 
 
 # Update topics
 @router.put("/topics/{topic_id}")
-def update_topic(topic_id: int, title: str, content: str, db=Depends(get_db), current_user=Depends(get_current_user)):
-    return CRUDOperations.update_topic(topic_id, title, content, db, current_user)
+async def update_topic(topic_id: int, title: str, content: str, db=Depends(get_db), current_user=Depends(get_current_user)):
+    return await CRUDOperations.update_topic(topic_id, title, content, db, current_user)
 
 # Update comments
 @router.put("/comments/{comment_id}")
-def update_comment(comment_id: int, content: str, db=Depends(get_db), current_user=Depends(get_current_user)):
-    return CRUDOperations.update_comment(comment_id, content, db, current_user)
+async def update_comment(comment_id: int, content: str, db=Depends(get_db), current_user=Depends(get_current_user)):
+    return await CRUDOperations.update_comment(comment_id, content, db, current_user)
 
 
 # Delete topics
 @router.delete("/topics/{topic_id}/delete")
-def delete_topic(topic_id: int, db=Depends(get_db), current_user=Depends(get_current_user)):
-    return CRUDOperations.delete_topic(topic_id, db, current_user)
+async def delete_topic(topic_id: int, db=Depends(get_db), current_user=Depends(get_current_user)):
+    return await CRUDOperations.delete_topic(topic_id, db, current_user)
 
 
 # Delete user
 @router.delete("/users/{user_id}")
-def delete_user(user_id: int, db=Depends(get_db), current_user=Depends(get_current_user)):
-    return CRUDOperations.delete_user(user_id, db, current_user)
+async def delete_user(user_id: int, db=Depends(get_db), current_user=Depends(get_current_user)):
+    return await CRUDOperations.delete_user(user_id, db, current_user)
 
 
 
 #notification functions:
 #get unread notifications
 @router.get("/notifications")
-def get_notifications(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    return SearchOperations.get_notifications(db, current_user)
+async def get_notifications(
+    limit: int = Query(NOTIFICATION_PAGE_SIZE, ge=1, le=MAX_NOTIFICATION_PAGE_SIZE),
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
+    return await SearchOperations.get_notifications(db, current_user, limit, after)
+
+
+#count unread notifications
+@router.get("/notifications/count")
+async def get_notification_count(db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    return await SearchOperations.get_notification_count(db, current_user)
 
 
-#mark unread notifications as read
-@router.get("/notifications/mark-read")
-def mark_notifications_as_read(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
-    return SearchOperations.mark_notification(db, current_user)
+#mark unread notifications as read: by ids, up to a watermark id, or all
+@router.post("/notifications/mark-read")
+async def mark_notifications_as_read(mark: MarkRead = MarkRead(), db: AsyncSession = Depends(get_db), current_user=Depends(get_current_user)):
+    return await SearchOperations.mark_notification(mark, db, current_user)
 
 
 #get all notifications
 @router.get("/notifications/all")
-def get_all_notifications(db: Session = Depends(get_db), current_user=Depends(get_current_user)):
+async def get_all_notifications(
+    limit: int = Query(NOTIFICATION_PAGE_SIZE, ge=1, le=MAX_NOTIFICATION_PAGE_SIZE),
+    after: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user=Depends(get_current_user)
+):
     """
-    retrieve all notifications for a user
+    retrieve one page of notifications for a user, pass next_cursor as `after` for the next page
     """
-    return SearchOperations.get_all_notifications(db, current_user)
+    return await SearchOperations.get_all_notifications(db, current_user, limit, after)
 
 
 
@@ -148,14 +192,18 @@ async def validate_image_url(url: str) -> bool:
 async def update_profile_image(
     image_data: ProfileImageUpdate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     try:
         # Update database with the provided URL
-        db.query(Usermodel).filter(Usermodel.id == current_user.id).update(
-            {"profile_image": str(image_data.image_url)}
+        await db.execute(
+            update(Usermodel).where(Usermodel.id == current_user.id).values(profile_image=str(image_data.image_url))
+        )
+        await db.commit()
+        await after_commit(
+            RedisCache().ainvalidate_tags(f"user:{current_user.id}"),
+            principal_cache.invalidate(current_user.email),
         )
-        db.commit()
         
         return {
             "message": "Profile image updated successfully",
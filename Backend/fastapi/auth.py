@@ -1,24 +1,29 @@
 from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
+import uuid
 import shutil
 from pathlib import Path
 from ..database.database import get_db
 from ..database.models import User as UserModel
+from ..redis.principals import Principal, principal_cache
+from .passwords import password_hasher
+from ..redis.revocation import revocation_list
 
 router = APIRouter()
 
 SECRET_KEY = "your_secret_key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+REFRESH_TOKEN_EXPIRE_DAYS = 7
 UPLOAD_DIR = Path("uploads/profile_images")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
 class User(BaseModel):
@@ -34,45 +39,82 @@ class UserInDB(User):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+    expires_in: Optional[int] = None   # seconds until access_token expires
 
 class TokenData(BaseModel):
     email: Optional[str] = None
+    jti: Optional[str] = None
+    expires_at: Optional[float] = None
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
 
-def get_user(db: Session, username: str = None, email: str = None):
+# bcrypt is CPU bound, it runs in the password_hasher process pool (see passwords.py)
+async def verify_password(plain_password, hashed_password):
+    return await password_hasher.verify(plain_password, hashed_password)
+
+async def get_password_hash(password):
+    return await password_hasher.hash(password)
+
+async def get_user(db: AsyncSession, username: str = None, email: str = None):
     if username:
-        return db.query(UserModel).filter(UserModel.name == username).first()
+        result = await db.execute(select(UserModel).where(UserModel.name == username))
+        return result.scalars().first()
     if email:
-        return db.query(UserModel).filter(UserModel.email == email).first()
+        result = await db.execute(select(UserModel).where(UserModel.email == email))
+        return result.scalars().first()
     return None
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = get_user(db, username)
-    if not user or not verify_password(password, user.hashed_password):
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await get_user(db, username)
+    if not user:
         return False
+    valid, new_hash = await password_hasher.verify_and_update(password, user.hashed_password)
+    if not valid:
+        return False
+    if new_hash:
+        # Stored with a lower cost than BCRYPT_ROUNDS: upgrade it while the plain password is at hand
+        await db.execute(update(UserModel).where(UserModel.id == user.id).values(hashed_password=new_hash))
+        await db.commit()
     return user
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None, token_type: str = "access"):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.utcnow() + expires_delta
     else:
         expire = datetime.utcnow() + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    # jti identifies the token in the revocation list
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex, "type": token_type})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
+def create_refresh_token(email: str):
+    return create_access_token(
+        data={"sub": email}, expires_delta=timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS), token_type="refresh"
+    )
+
+def issue_tokens(email: str) -> dict:
+    access_token = create_access_token(
+        data={"sub": email}, expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    )
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "refresh_token": create_refresh_token(email),
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
 @router.post("/register", response_model=UserInDB)
-def register(
+async def register(
     user: User,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash(user.password)
     
     db_user = UserModel(
         name=user.name,
@@ -82,8 +124,8 @@ def register(
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return UserInDB(
         id=db_user.id,
@@ -95,46 +137,115 @@ def register(
     )
 
 @router.post("/token", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-    return {"access_token": access_token, "token_type": "bearer"}
+    return issue_tokens(user.email)
+
+async def decode_token(token: str, token_type: str, check_revoked: bool = True) -> Optional[TokenData]:
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    email: str = payload.get("sub")
+    # Tokens issued before refresh tokens existed carry no type and are access tokens
+    if email is None or payload.get("type", "access") != token_type:
+        return None
+    jti = payload.get("jti")
+    # The Bloom filter answers for almost every token without a Redis round trip
+    if check_revoked and jti is not None and await revocation_list.is_revoked(jti):
+        return None
+    return TokenData(email=email, jti=jti, expires_at=payload.get("exp"))
+
+async def decode_access_token(token: str) -> Optional[TokenData]:
+    # Shared by the REST dependency below and the notification WebSocket
+    return await decode_token(token, "access")
+
+@router.post("/refresh", response_model=Token)
+async def refresh_access_token(request: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    # Exchanges a refresh token for a new pair without the password. The old
+    # refresh token is claimed atomically in Redis, so each one can be used
+    # only once, even by concurrent requests on different workers.
+    token_data = await decode_token(request.refresh_token, "refresh", check_revoked=False)
+    if token_data is None or token_data.jti is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if await principal_cache.get(token_data.email) is None and await get_user(db, email=token_data.email) is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if not await revocation_list.claim(token_data.jti, token_data.expires_at):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return issue_tokens(token_data.email)
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+@router.post("/logout")
+async def logout(request: Optional[LogoutRequest] = None, token: str = Depends(oauth2_scheme)):
+    # Revokes the presented access token and, when given, the session's refresh token
+    token_data = await decode_access_token(token)
+    if token_data is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    if token_data.jti is not None:
+        await revocation_list.revoke(token_data.jti, token_data.expires_at)
+    if request is not None and request.refresh_token:
+        refresh_data = await decode_token(request.refresh_token, "refresh")
+        if refresh_data is not None and refresh_data.jti is not None and refresh_data.email == token_data.email:
+            await revocation_list.revoke(refresh_data.jti, refresh_data.expires_at)
+    return {"message": "Logged out"}
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)) -> Principal:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
-    except JWTError:
+    token_data = await decode_access_token(token)
+    if token_data is None:
         raise credentials_exception
-    user = get_user(db, email=token_data.email)
-    if user is None:
-        raise credentials_exception
-    return user
+    # Cached snapshot first, Postgres only on a miss (the session connects lazily)
+    principal = await principal_cache.get(token_data.email)
+    if principal is None:
+        user = await get_user(db, email=token_data.email)
+        if user is None:
+            raise credentials_exception
+        principal = Principal.from_user(user)
+        await principal_cache.put(token_data.email, principal)
+    return principal
 
 @router.put("/update-password")
-def update_password(password: str, new_password: str, db: Session = Depends(get_db), current_user: UserInDB = Depends(get_current_user)):
-    if not verify_password(password, current_user.hashed_password):
+async def update_password(password: str, new_password: str, db: AsyncSession = Depends(get_db), current_user: Principal = Depends(get_current_user)):
+    # The cached principal carries no password hash, read it from the row
+    hashed = (await db.execute(select(UserModel.hashed_password).where(UserModel.id == current_user.id))).scalar()
+    if hashed is None or not await verify_password(password, hashed):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this password since password is incorrect.")
     else:
-        hashed_password = get_password_hash(new_password)
-        db.query(UserModel).update({"hashed_password": hashed_password})
-        db.commit()
+        hashed_password = await get_password_hash(new_password)
+        await db.execute(
+            update(UserModel).where(UserModel.id == current_user.id).values(hashed_password=hashed_password)
+        )
+        await db.commit()
+        await principal_cache.invalidate(current_user.email)
         
-        return {"message": "Password updated successfully"}
\ No newline at end of file
+        return {"message": "Password updated successfully"}
+
+@router.get("/hashing-metrics")
+async def hashing_metrics(current_user: Principal = Depends(get_current_user)):
+    # Pool load and counters of this worker's password hasher
+    return password_hasher.metrics()
@@ -1,19 +1,31 @@
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from sqlalchemy import tuple_, update, func
 from sqlalchemy.orm import joinedload
 from fastapi import Depends, HTTPException, status
 from pydantic import BaseModel
+from typing import Awaitable, List, Optional
+from datetime import datetime
+import base64
+from redis.exceptions import RedisError
 from .auth import get_current_user
 from ..database.models import User, Topic, Comment, Notification
 from ..database.database import get_db
-from ..rabbitmq.rabbitmq import publish_message
-from ..utils.structures import Trie, Heap
+from ..rabbitmq.rabbitmq import publish_event, TOPIC_QUEUE, USER_QUEUE
 from ..redis.redis import RedisCache
+from ..redis.inbox import NotificationInbox, get_inbox_state
+from ..redis.trending import TrendingEngine, TRENDING_CACHE_NAMESPACE
+from ..redis.principals import principal_cache
+from ..redis.search_index import index_replicator, topic_upsert, topic_delete, comment_upsert, comment_delete, SUGGEST_TOP_K
+from .websocket import manager
 
-topic_trie = Trie()
-topic_heap = Heap()
-comment_trie = Trie()
-comment_heap = Heap()
+# Per-worker search structures, kept in step across workers by index_replicator.
+# Writes below publish index events instead of mutating these directly.
+topic_trie = index_replicator.topic_trie
+topic_heap = index_replicator.topic_heap
+active_topic_heap = index_replicator.active_topic_heap
+comment_trie = index_replicator.comment_trie
+comment_heap = index_replicator.comment_heap
 
 class TopicCreate(BaseModel):
     title: str
@@ -23,69 +35,181 @@ class CommentCreate(BaseModel):
     topic_id: int
     content: str
 
+class MarkRead(BaseModel):
+    # ids marks exactly those notifications, up_to marks every id <= up_to,
+    # and an empty body marks all of them
+    ids: Optional[List[int]] = None
+    up_to: Optional[int] = None
+
+NOTIFICATION_PAGE_SIZE = 20
+MAX_NOTIFICATION_PAGE_SIZE = 100
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    # Opaque keyset cursor pointing just past the given (created_at, id) row
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{id}".encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(id)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+
+async def _notification_page(db: AsyncSession, current_user: User, limit: int, after: Optional[str], unread_only: bool):
+    query = (
+        select(Notification)
+        .where(Notification.user_id == current_user.id)
+        .order_by(Notification.created_at.desc(), Notification.id.desc())
+        .limit(limit + 1)  # one extra row tells us whether there is a next page
+    )
+    if unread_only:
+        query = query.where(Notification.is_read == False)
+    if after:
+        created_at, id = decode_cursor(after)
+        # The plain bound lets Postgres skip the partitions of later months
+        query = query.where(Notification.created_at <= created_at, tuple_(Notification.created_at, Notification.id) < (created_at, id))
+    notifications = (await db.execute(query)).scalars().all()
+
+    page = notifications[:limit]
+    has_more = len(notifications) > limit
+    return {
+        "notifications": [
+            {
+                "id": n.id,
+                "message": n.message,
+                "created_at": n.created_at,
+                "is_read": n.is_read
+            } for n in page
+        ],
+        "next_cursor": encode_cursor(page[-1].created_at, page[-1].id) if has_more else None,
+    }
+
+FEED_PAGE_SIZE = 20
+MAX_FEED_PAGE_SIZE = 100
+
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+SEARCH_CONFIG = "english"
+SNIPPET_OPTIONS = "StartSel=<b>, StopSel=</b>, MaxFragments=2, MaxWords=30, MinWords=10"
+
+def _ranked_matches(model, tsquery, limit: int, offset: int):
+    # Match and rank on the GIN-indexed search_vector, fetching one extra row
+    # to tell whether another page exists
+    rank = func.ts_rank(model.search_vector, tsquery)
+    return (
+        select(model.id, rank.label("rank"))
+        .where(model.search_vector.bool_op("@@")(tsquery))
+        .order_by(rank.desc(), model.id.desc())
+        .limit(limit + 1)
+        .offset(offset)
+        .subquery()
+    )
+
+def _search_page(rows, limit: int, offset: int):
+    return {
+        "results": [dict(row._mapping) for row in rows[:limit]],
+        "next_offset": offset + limit if len(rows) > limit else None,
+    }
+
+async def after_commit(*updates: Awaitable):
+    # Index events, trending scores and cache invalidations that follow a
+    # committed write. They are best-effort: failing the request here would
+    # make the client retry a write that already happened. Caches age out,
+    # and the trending reconciliation job and index rebuilds catch up.
+    for pending in updates:
+        try:
+            await pending
+        except RedisError as e:
+            print(f"Post-commit update failed: {e}")
+
 class CRUDOperations:
     
     @staticmethod
-    def create_topic(topic: TopicCreate, db: Session, current_user: User):
+    async def create_topic(topic: TopicCreate, db: AsyncSession, current_user: User):
         new_topic = Topic(user_id=current_user.id, title=topic.title, content=topic.content)
         db.add(new_topic)
-        db.commit()
-        db.refresh(new_topic)
-        publish_message("topic_queue", f"New topic created: {new_topic.title}")
-        topic_trie.insert(new_topic.title)
-        topic_heap.push((new_topic.id, new_topic.title))
-        RedisCache().delete("trending_topics:*")  # Clear all trending caches
+        await db.commit()
+        await db.refresh(new_topic)
+        publish_event(TOPIC_QUEUE, "topic_created", topic_id=new_topic.id, user_id=current_user.id, title=new_topic.title)
+        await after_commit(
+            index_replicator.publish([topic_upsert(new_topic.id, new_topic.title, 0)]),
+            RedisCache().ainvalidate(TRENDING_CACHE_NAMESPACE),  # Clear all trending caches
+            RedisCache().ainvalidate_tags("topics", f"user:{current_user.id}"),
+        )
         return {"message": "Topic created"}
 
     @staticmethod
-    def add_comment(comment: CommentCreate, db: Session, current_user: User):
-        new_comment = Comment(user_id=current_user.id, topic_id=comment.topic_id, content=comment.content)
+    async def add_comment(comment: CommentCreate, db: AsyncSession, current_user: User):
+        # Bump the topic's counters in the comment's transaction. The UPDATE is
+        # atomic under concurrent comments and also tells us the topic exists.
+        now = datetime.utcnow()
+        topic = (await db.execute(
+            update(Topic)
+            .where(Topic.id == comment.topic_id)
+            .values(comment_count=Topic.comment_count + 1, last_activity_at=now)
+            .returning(Topic.id, Topic.user_id, Topic.title, Topic.comment_count)
+        )).first()
+        if topic is None:
+            await db.rollback()
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Topic not found")
+        new_comment = Comment(user_id=current_user.id, topic_id=comment.topic_id, content=comment.content, created_at=now)
         db.add(new_comment)
-        db.commit()
-        db.refresh(new_comment)
+        await db.commit()
+        await db.refresh(new_comment)
         
-        topic = db.execute(select(Topic).where(Topic.id == comment.topic_id)).scalars().first()
-        if topic and topic.user_id != current_user.id:  # Avoid notifying the commenter themselves
-            notification_message = f"{current_user.name} commented on your topic: {topic.title}"
-            new_notification = Notification(user_id=topic.user_id, message=notification_message)
-            db.add(new_notification)
-            db.commit()
-        publish_message(f'topic_queue', f'New Comment: {comment.content} for topic: {comment.topic_id}')
-        comment_trie.insert(new_comment.content)
-        comment_heap.push((new_comment.id, new_comment.content))
-        RedisCache().delete("trending_topics:*")  # Clear all trending caches
+        # The notification consumer turns this into the topic owner's notification
+        publish_event(
+            TOPIC_QUEUE, "comment_created",
+            comment_id=new_comment.id, topic_id=topic.id, user_id=current_user.id,
+            author_name=current_user.name, topic_owner_id=topic.user_id, topic_title=topic.title,
+        )
+        await after_commit(
+            index_replicator.publish([
+                comment_upsert(new_comment.id, new_comment.content),
+                topic_upsert(topic.id, topic.title, topic.comment_count),
+            ]),
+            # Cached trends catch up within WINDOW_CACHE_TTL rather than on every comment
+            TrendingEngine().record_comment(comment.topic_id),
+            RedisCache().ainvalidate_tags(f"topic:{comment.topic_id}"),
+        )
         return {"message": "Comment added"}
 
     @staticmethod
-    def update_topic(topic_id: int, title: str, content: str, db: Session, current_user: User):
-        result = db.execute(select(Topic).where(Topic.id == topic_id).options(joinedload(Topic.owner)))
+    async def update_topic(topic_id: int, title: str, content: str, db: AsyncSession, current_user: User):
+        result = await db.execute(select(Topic).where(Topic.id == topic_id).options(joinedload(Topic.owner)))
         topic = result.scalars().first()
         if not topic or topic.owner.id != current_user.id:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this topic")
         topic.title = title
         topic.content = content
-        db.commit()
-        publish_message("topic_queue", f"Topic updated: {topic.title}")
-        topic_trie.insert(topic.title)
-        topic_heap.push((topic.id, topic.title))
+        await db.commit()
+        publish_event(TOPIC_QUEUE, "topic_updated", topic_id=topic.id, user_id=current_user.id, title=topic.title)
+        await after_commit(
+            index_replicator.publish([topic_upsert(topic.id, topic.title, topic.comment_count)]),
+            RedisCache().ainvalidate(TRENDING_CACHE_NAMESPACE),  # Cached trends carry the old title
+            RedisCache().ainvalidate_tags("topics", f"topic:{topic.id}"),
+        )
         return {"message": "Topic updated successfully"}
 
     @staticmethod
-    def update_comment(comment_id: int, content: str, db: Session, current_user: User):
-        result = db.execute(select(Comment).where(Comment.id == comment_id).options(joinedload(Comment.author)))
+    async def update_comment(comment_id: int, content: str, db: AsyncSession, current_user: User):
+        result = await db.execute(select(Comment).where(Comment.id == comment_id).options(joinedload(Comment.author)))
         comment = result.scalars().first()
         if not comment or comment.author.id != current_user.id:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to update this comment")
+        old_content = comment.content
         comment.content = content
-        db.commit()
-        publish_message(f'topic_{comment.topic_id}', f"Comment updated: {comment.content}")
-        comment_trie.insert(comment.content)
-        comment_heap.push((comment.id, comment.content))
+        await db.commit()
+        publish_event(TOPIC_QUEUE, "comment_updated", comment_id=comment.id, topic_id=comment.topic_id, user_id=current_user.id)
+        await after_commit(
+            index_replicator.publish([comment_upsert(comment.id, comment.content, old_content)]),
+            RedisCache().ainvalidate_tags(f"comment:{comment.id}", f"topic:{comment.topic_id}"),
+        )
         return {"message": "Comment updated successfully"}
     
     @staticmethod
-    def delete_topic(topic_id: int, db: Session, current_user: User):
-        topic = db.execute(select(Topic).where(Topic.id == topic_id)).scalars().first()
+    async def delete_topic(topic_id: int, db: AsyncSession, current_user: User):
+        topic = (await db.execute(select(Topic).where(Topic.id == topic_id))).scalars().first()
         if not topic or topic.user_id != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN, 
@@ -94,75 +218,90 @@ class CRUDOperations:
         
         try:
             # First delete all comments associated with the topic
-            comments = db.execute(
+            comments = (await db.execute(
                 select(Comment).where(Comment.topic_id == topic_id)
-            ).scalars().all()
+            )).scalars().all()
             
             # Delete comments from database
             for comment in comments:
-                db.delete(comment)
-                
-                # Remove from heap only (since Trie doesn't have remove)
-                if hasattr(comment_heap, 'remove'):
-                    try:
-                        comment_heap.remove((comment.id, comment.content))
-                    except ValueError:
-                        pass  # Item not in heap
+                await db.delete(comment)
             
             # Delete the topic
-            db.delete(topic)
-            
-            # Remove from heap only
-            if hasattr(topic_heap, 'remove'):
-                try:
-                    topic_heap.remove((topic.id, topic.title))
-                except ValueError:
-                    pass  # Item not in heap
+            await db.delete(topic)
             
-            db.commit()
-            
-            # Clear cache after successful deletion
-            publish_message("topic_queue", f"Topic deleted: {topic.title}")
-            RedisCache().delete("trending_topics:*")
-            
-            return {"message": "Topic deleted successfully"}
+            await db.commit()
             
         except Exception as e:
-            db.rollback()
+            await db.rollback()
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail=f"Failed to delete topic: {str(e)}"
             )
+
+        # Clear cache after successful deletion
+        publish_event(TOPIC_QUEUE, "topic_deleted", topic_id=topic.id, user_id=current_user.id, title=topic.title)
+        await after_commit(
+            # Drops the topic and its comments from every worker's tries and feed heaps
+            index_replicator.publish(
+                [topic_delete(topic.id)] + [comment_delete(comment.id, comment.content) for comment in comments]
+            ),
+            TrendingEngine().remove_topics([topic.id]),
+            RedisCache().ainvalidate(TRENDING_CACHE_NAMESPACE),
+            RedisCache().ainvalidate_tags("topics", f"topic:{topic.id}", f"user:{current_user.id}"),
+        )
+        return {"message": "Topic deleted successfully"}
     
     @staticmethod
-    def delete_user(user_id: int, db: Session, current_user: User):
+    async def delete_user(user_id: int, db: AsyncSession, current_user: User):
         if current_user.id != user_id:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not authorized to delete this user")
         
         
-        Notifications = db.execute(select(Notification).where(Notification.user_id == user_id)).scalars().all()
+        Notifications = (await db.execute(select(Notification).where(Notification.user_id == user_id))).scalars().all()
         for notification in Notifications:
-            db.delete(notification)
+            await db.delete(notification)
             
         
-        comments = db.execute(select(Comment).where(Comment.user_id == user_id)).scalars().all()
+        comments = (await db.execute(select(Comment).where(Comment.user_id == user_id))).scalars().all()
         for comment in comments:
-            db.delete(comment)
-            comment_trie.remove(comment.content)
-            comment_heap.remove((comment.id, comment.content))
+            await db.delete(comment)
+        # Topics of other users keep their rows, take the deleted comments off their counts
+        removed = {}
+        for comment in comments:
+            removed[comment.topic_id] = removed.get(comment.topic_id, 0) + 1
+        recounted = []
+        for topic_id, count in removed.items():
+            recounted += (await db.execute(
+                update(Topic).where(Topic.id == topic_id, Topic.user_id != user_id)
+                .values(comment_count=Topic.comment_count - count)
+                .returning(Topic.id, Topic.title, Topic.comment_count)
+            )).all()
         
-        topics = db.execute(select(Topic).where(Topic.user_id == user_id)).scalars().all()
+        topics = (await db.execute(select(Topic).where(Topic.user_id == user_id))).scalars().all()
         for topic in topics:
-            db.delete(topic)
-            topic_trie.remove(topic.title)
-            topic_heap.remove((topic.id, topic.title))
+            await db.delete(topic)
         
-        user = db.execute(select(User).where(User.id == user_id)).scalars().first()
+        user = (await db.execute(select(User).where(User.id == user_id))).scalars().first()
         if user:
-            db.delete(user)
+            await db.delete(user)
         
-        db.commit()
-        publish_message("user_queue", f"User deleted: {user_id}")
+        await db.commit()
+        await after_commit(
+            index_replicator.publish(
+                [topic_delete(topic.id) for topic in topics]
+                + [comment_delete(comment.id, comment.content) for comment in comments]
+                + [topic_upsert(id, title, count) for id, title, count in recounted]
+            ),
+            TrendingEngine().remove_topics([topic.id for topic in topics]),
+            RedisCache().ainvalidate(TRENDING_CACHE_NAMESPACE),
+            RedisCache().ainvalidate_tags(
+                "topics", f"user:{user_id}",
+                *(f"topic:{topic.id}" for topic in topics),
+                *(f"topic:{comment.topic_id}" for comment in comments),
+            ),
+            principal_cache.invalidate(current_user.email),
+        )
+        publish_event(USER_QUEUE, "user_deleted", user_id=user_id)
         return {"message": "User and related data deleted successfully"}
     
     
@@ -171,81 +310,95 @@ class SearchOperations:
     
     
     @staticmethod
-    def get_topics_username(user_name: str, db: Session, current_user: User):
-        result = db.execute(select(User).where(User.name.ilike(f'%{user_name}%')))
+    async def get_topics_username(user_name: str, db: AsyncSession, current_user: User):
+        result = await db.execute(select(User).where(User.name.ilike(f'%{user_name}%')))
         user = result.scalars().first()
         if user:
-            topics = db.execute(select(Topic).where(Topic.user_id == user.id)).scalars().all()
+            topics = (await db.execute(select(Topic).where(Topic.user_id == user.id))).scalars().all()
             return topics
         return []
     
     @staticmethod
-    def search_topics(title: str, db: Session, current_user: User):
-        if topic_trie.search(title):
-            result = db.execute(select(Topic).where(Topic.title.ilike(f'%{title}%') | Topic.content.ilike(f'%{title}%')))
-            topics = result.scalars().all()
-            return topics
-        return []
+    async def get_feed(kind: str, current_user: User, limit: int = FEED_PAGE_SIZE):
+        # Served from this worker's bounded feed heaps, no database round trip
+        return {"kind": kind, "topics": index_replicator.feed(kind, limit)}
     
     @staticmethod
-    def get_notifications(db: Session, current_user: User):
-        # Fetch notifications for the current user, ordered by most recent first
-        notifications = db.execute(
-            select(Notification)
-            .where(Notification.user_id == current_user.id)
-            .where(Notification.is_read == False)
-            .order_by(Notification.created_at.desc())
-        ).scalars().all()
-        
-        # for notification in notifications:
-        #     notification.is_read = True
-            
-        # db.commit()
-        
-        return [
-            {
-                "id": n.id, 
-                "message": n.message, 
-                "created_at": n.created_at
-            } for n in notifications
-        ]
+    async def search_topics(query: str, db: AsyncSession, current_user: User, limit: int = SEARCH_PAGE_SIZE, offset: int = 0):
+        tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        matches = _ranked_matches(Topic, tsquery, limit, offset)
+        # Snippets are only built for the rows of the requested page
+        rows = (await db.execute(
+            select(
+                Topic.id,
+                Topic.user_id,
+                Topic.title,
+                matches.c.rank,
+                func.ts_headline(SEARCH_CONFIG, Topic.title, tsquery, "StartSel=<b>, StopSel=</b>, HighlightAll=true").label("title_highlight"),
+                func.ts_headline(SEARCH_CONFIG, Topic.content, tsquery, SNIPPET_OPTIONS).label("snippet"),
+            )
+            .join(matches, matches.c.id == Topic.id)
+            .order_by(matches.c.rank.desc(), Topic.id.desc())
+        )).all()
+        return _search_page(rows, limit, offset)
+
     @staticmethod
-    def mark_notification(db:Session, current_user: User):
-        notifications = db.execute(
-            select(Notification)
+    async def search_comments(query: str, db: AsyncSession, current_user: User, limit: int = SEARCH_PAGE_SIZE, offset: int = 0):
+        tsquery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        matches = _ranked_matches(Comment, tsquery, limit, offset)
+        rows = (await db.execute(
+            select(
+                Comment.id,
+                Comment.user_id,
+                Comment.topic_id,
+                matches.c.rank,
+                func.ts_headline(SEARCH_CONFIG, Comment.content, tsquery, SNIPPET_OPTIONS).label("snippet"),
+            )
+            .join(matches, matches.c.id == Comment.id)
+            .order_by(matches.c.rank.desc(), Comment.id.desc())
+        )).all()
+        return _search_page(rows, limit, offset)
+    
+    @staticmethod
+    async def get_notifications(db: AsyncSession, current_user: User, limit: int = NOTIFICATION_PAGE_SIZE, after: Optional[str] = None):
+        # Fetch one page of unread notifications, ordered by most recent first
+        return await _notification_page(db, current_user, limit, after, unread_only=True)
+
+    @staticmethod
+    async def get_notification_count(db: AsyncSession, current_user: User):
+        # Served from the Redis inbox, Postgres is only read to rebuild a missing inbox
+        unread, latest_id = await get_inbox_state(db, current_user.id)
+        return {"unread_count": unread, "latest_id": latest_id}
+
+    @staticmethod
+    async def mark_notification(mark: MarkRead, db: AsyncSession, current_user: User):
+        # One UPDATE ... RETURNING id, no notification rows are loaded into the session
+        query = (
+            update(Notification)
             .where(Notification.user_id == current_user.id)
             .where(Notification.is_read == False)
-            .order_by(Notification.created_at.desc())
-        ).scalars().all()
-        
-        for notification in notifications:
-            notification.is_read = True
-            
-        db.commit()
-        
-        return [
-            {
-                "id": n.id, 
-                "message": n.message, 
-                "created_at": n.created_at,
-                "is_read": n.is_read
-            } for n in notifications
-        ]
+            .values(is_read=True)
+            .returning(Notification.id)
+            .execution_options(synchronize_session=False)
+        )
+        if mark.ids is not None:
+            query = query.where(Notification.id.in_(mark.ids))
+        elif mark.up_to is not None:
+            query = query.where(Notification.id <= mark.up_to)
+        marked = (await db.execute(query)).scalars().all()
+        await db.commit()
+
+        inbox = NotificationInbox()
+        if mark.ids is None and mark.up_to is None:
+            await inbox.mark_all_read(current_user.id)
+        else:
+            await inbox.mark_read(current_user.id, len(marked))
+        unread, _ = await get_inbox_state(db, current_user.id)
+        await manager.notify(current_user.id, {"type": "unread_count", "count": unread})
+
+        return {"marked": marked, "unread_count": unread}
         
     @staticmethod
-    def get_all_notifications(db: Session, current_user: User):
-        # Fetch all notifications for the current user, ordered by most recent first
-        notifications = db.execute(
-            select(Notification)
-            .where(Notification.user_id == current_user.id)
-            .order_by(Notification.created_at.desc())
-        ).scalars().all()
-        
-        return [
-            {
-                "id": n.id, 
-                "message": n.message, 
-                "created_at": n.created_at,
-                "is_read": n.is_read
-            } for n in notifications
-        ]
\ No newline at end of file
+    async def get_all_notifications(db: AsyncSession, current_user: User, limit: int = NOTIFICATION_PAGE_SIZE, after: Optional[str] = None):
+        # Fetch one page of all notifications for the current user, ordered by most recent first
+        return await _notification_page(db, current_user, limit, after, unread_only=False)
@@ -0,0 +1,121 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+
+# bcrypt cost factor (2**rounds iterations). Pick it with
+# python -m Backend.utils.benchmark_bcrypt, about 250 ms per hash is typical.
+# Hashes below it are upgraded the next time their owner logs in.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Every API process has its own pool, so the cores are split between the
+# WEB_CONCURRENCY processes (uvicorn's default for --workers) rather than each
+# pool taking all of them and starving the event loops again.
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY))))   # hashing processes
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "64"))   # running + waiting jobs before requests get a 503
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_desired_rounds=BCRYPT_ROUNDS,
+)
+
+
+# Run inside the pool processes, which import this module by name
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify(password: str, hashed: str) -> bool:
+    return pwd_context.verify(password, hashed)
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed)
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a pool of worker processes, so hashing uses this API
+    process's share of the cores without holding the GIL or the event loop. Jobs beyond queue_limit are
+    refused with a 503 instead of queueing behind a login burst.
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, queue_limit: int = HASH_QUEUE_LIMIT):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.pool = None
+        self.pending = 0
+        self.max_pending = 0
+        self.counts = {"hashed": 0, "verified": 0, "rehashed": 0, "rejected": 0, "failed": 0}
+        self.busy_seconds = 0.0
+
+    def start(self):
+        if self.pool is None:
+            # spawn, not fork: the parent runs an event loop and other threads
+            self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def stop(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+            self.pool = None
+
+    async def _run(self, fn, *args):
+        if self.pending >= self.queue_limit:
+            self.counts["rejected"] += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many password operations in progress, retry shortly",
+                headers={"Retry-After": "1"},
+            )
+        self.start()
+        self.pending += 1
+        self.max_pending = max(self.max_pending, self.pending)
+        started = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, fn, *args)
+        except BrokenProcessPool:
+            # A worker died, start a fresh pool for the next job
+            self.counts["failed"] += 1
+            self.stop()
+            raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Password hashing unavailable, retry shortly")
+        finally:
+            self.pending -= 1
+            self.busy_seconds += time.perf_counter() - started
+
+    async def hash(self, password: str) -> str:
+        hashed = await self._run(_hash, password)
+        self.counts["hashed"] += 1
+        return hashed
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        valid = await self._run(_verify, password, hashed)
+        self.counts["verified"] += 1
+        return valid
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        # new_hash is set when the stored hash is valid but below the configured cost
+        valid, new_hash = await self._run(_verify_and_update, password, hashed)
+        self.counts["verified"] += 1
+        if new_hash:
+            self.counts["rehashed"] += 1
+        return valid, new_hash
+
+    def metrics(self) -> dict:
+        completed = self.counts["hashed"] + self.counts["verified"]
+        return {
+            "rounds": BCRYPT_ROUNDS,
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            **self.counts,
+            "avg_ms": round(self.busy_seconds / completed * 1000, 1) if completed else None,
+        }
+
+
+password_hasher = PasswordHasher()
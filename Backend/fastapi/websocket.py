@@ -0,0 +1,107 @@
+import asyncio
+import json
+from typing import Dict, Set
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect, status
+import redis.asyncio as aioredis
+from .auth import decode_access_token, get_user
+from ..database.database import SessionLocal
+from ..database.models import Notification
+from ..redis.redis import RedisCache
+from ..redis.inbox import get_inbox_state
+
+router = APIRouter()
+
+# Every API worker subscribes to this channel, so a notification created on one
+# worker reaches sockets held by any other worker.
+NOTIFICATION_CHANNEL = "notifications"
+
+
+class ConnectionManager:
+    def __init__(self):
+        self.active_connections: Dict[int, Set[WebSocket]] = {}
+
+    async def connect(self, user_id: int, websocket: WebSocket):
+        await websocket.accept()
+        self.active_connections.setdefault(user_id, set()).add(websocket)
+
+    def disconnect(self, user_id: int, websocket: WebSocket):
+        connections = self.active_connections.get(user_id)
+        if connections:
+            connections.discard(websocket)
+            if not connections:
+                del self.active_connections[user_id]
+
+    async def send_to_user(self, user_id: int, message: dict):
+        for websocket in list(self.active_connections.get(user_id, ())):
+            try:
+                await websocket.send_json(message)
+            except Exception:
+                self.disconnect(user_id, websocket)
+
+    async def notify(self, user_id: int, message: dict):
+        # Safe to call from request handlers on any worker
+        await RedisCache().apublish(NOTIFICATION_CHANNEL, {"user_id": user_id, "payload": message})
+
+    async def listen(self):
+        client = aioredis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
+        while True:
+            try:
+                pubsub = client.pubsub()
+                await pubsub.subscribe(NOTIFICATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    data = json.loads(message["data"])
+                    if data["user_id"] in self.active_connections:
+                        await self.send_to_user(data["user_id"], data["payload"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Notification listener error: {e}")
+                await asyncio.sleep(1)
+
+
+manager = ConnectionManager()
+
+
+def serialize_notification(notification: Notification) -> dict:
+    return {
+        "id": notification.id,
+        "message": notification.message,
+        "created_at": notification.created_at.isoformat() if notification.created_at else None,
+        "is_read": notification.is_read,
+    }
+
+
+async def _load_user_state(email: str):
+    async with SessionLocal() as db:
+        user = await get_user(db, email=email)
+        if user is None:
+            return None, 0
+        unread, _ = await get_inbox_state(db, user.id)
+        return user, unread
+
+
+@router.websocket("/notifications")
+async def notifications_socket(websocket: WebSocket, token: str):
+    # Browsers cannot set headers on a WebSocket handshake, so the JWT issued by
+    # /auth/token is passed as a query parameter instead.
+    token_data = await decode_access_token(token)
+    if token_data is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    user, unread = await _load_user_state(token_data.email)
+    if user is None:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    await manager.connect(user.id, websocket)
+    try:
+        await websocket.send_json({"type": "unread_count", "count": unread})
+        while True:
+            # Nothing is expected from the client, this just keeps the socket open
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        manager.disconnect(user.id, websocket)
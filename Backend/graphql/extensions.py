@@ -0,0 +1,165 @@
+import dataclasses
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, Optional
+from graphql import (
+    ExecutionResult, FieldNode, FragmentSpreadNode, GraphQLError, GraphQLList, GraphQLNonNull,
+    GraphQLObjectType, InlineFragmentNode, IntValueNode, VariableNode, get_named_type,
+)
+from graphql.utilities import get_operation_ast
+from strawberry.extensions import SchemaExtension, FieldExtension
+from strawberry.types.base import StrawberryList, StrawberryOptional, get_object_definition
+from redis.exceptions import RedisError
+from ..redis.redis import RedisCache
+
+# Arguments that bound how many items a list field returns
+LIST_SIZE_ARGUMENTS = ("first", "limit", "k")
+DEFAULT_LIST_SIZE = 10   # assumed size of a list field without one of those arguments
+
+
+def _list_size(node: FieldNode, variables: Dict[str, Any]) -> Optional[int]:
+    for argument in node.arguments:
+        if argument.name.value not in LIST_SIZE_ARGUMENTS:
+            continue
+        # Resolvers clamp sizes below 1 up to 1, price them the same
+        if isinstance(argument.value, IntValueNode):
+            return max(1, int(argument.value.value))
+        if isinstance(argument.value, VariableNode):
+            value = variables.get(argument.value.name.value)
+            if isinstance(value, int):
+                return max(1, value)
+    return None
+
+
+def selection_cost(parent_type: GraphQLObjectType, selection_set, fragments, variables, sized: bool = False) -> int:
+    # Every field costs 1, and a list field multiplies the cost of what it selects
+    # by the number of items it may return. sized means the parent field already
+    # took a size argument for the lists directly below it (a connection type).
+    cost = 0
+    for selection in selection_set.selections:
+        if isinstance(selection, FragmentSpreadNode):
+            fragment = fragments[selection.name.value]
+            cost += selection_cost(parent_type, fragment.selection_set, fragments, variables, sized)
+        elif isinstance(selection, InlineFragmentNode):
+            cost += selection_cost(parent_type, selection.selection_set, fragments, variables, sized)
+        elif not selection.name.value.startswith("__"):
+            field = parent_type.fields[selection.name.value]
+            field_type = field.type.of_type if isinstance(field.type, GraphQLNonNull) else field.type
+            is_list = isinstance(field_type, GraphQLList)
+            size = _list_size(selection, variables)
+            child_cost = 0
+            if selection.selection_set:
+                child_cost = selection_cost(
+                    get_named_type(field_type), selection.selection_set, fragments, variables,
+                    sized=size is not None and not is_list,
+                )
+            if size is not None:
+                multiplier = size
+            elif is_list:
+                multiplier = 1 if sized else DEFAULT_LIST_SIZE
+            else:
+                multiplier = 1
+            cost += 1 + multiplier * child_cost
+    return cost
+
+
+class QueryCostLimiter(SchemaExtension):
+    """
+    Estimates the cost of the operation from its document and variables and
+    rejects it before any resolver runs when it exceeds max_cost.
+    """
+
+    def __init__(self, max_cost: int):
+        self.max_cost = max_cost
+
+    def on_execute(self):
+        execution_context = self.execution_context
+        document = execution_context.graphql_document
+        operation = get_operation_ast(document, execution_context.operation_name)
+        if operation is not None:
+            schema = execution_context.schema._schema
+            root_type = schema.get_root_type(operation.operation)
+            fragments = {
+                definition.name.value: definition
+                for definition in document.definitions if definition.kind == "fragment_definition"
+            }
+            cost = selection_cost(root_type, operation.selection_set, fragments, execution_context.variables or {})
+            if cost > self.max_cost:
+                # A result set here makes strawberry skip execution entirely
+                execution_context.result = ExecutionResult(data=None, errors=[
+                    GraphQLError(f"Query cost {cost} exceeds the maximum of {self.max_cost}")
+                ])
+        yield
+
+
+FIELD_CACHE_TTL = 300   # seconds; tag invalidation normally drops entries long before
+
+
+def dump_result(value):
+    # Plain JSON for a resolver result; fields computed by resolvers (owner,
+    # comments, ...) are not stored and resolve again on the rebuilt object
+    if dataclasses.is_dataclass(value):
+        return {field.name: dump_result(getattr(value, field.name)) for field in dataclasses.fields(value) if field.init}
+    if isinstance(value, list):
+        return [dump_result(item) for item in value]
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def load_result(field_type, data):
+    if data is None:
+        return None
+    if isinstance(field_type, StrawberryOptional):
+        return load_result(field_type.of_type, data)
+    if isinstance(field_type, StrawberryList):
+        return [load_result(field_type.of_type, item) for item in data]
+    if field_type is datetime:
+        return datetime.fromisoformat(data)
+    definition = get_object_definition(field_type)
+    if definition is not None:
+        # Fields missing from entries cached before they existed keep their defaults
+        return field_type(**{
+            field.python_name: load_result(field.type, data[field.python_name])
+            for field in definition.fields if field.base_resolver is None and field.python_name in data
+        })
+    return data
+
+
+class CacheField(FieldExtension):
+    """
+    Caches a field's resolved value in Redis per field and arguments. tags
+    maps (result, arguments) to the entity tags the value depends on, and
+    CRUDOperations drops entries through RedisCache.invalidate_tags().
+    Empty results are not cached, a later write could fill them untagged.
+    """
+
+    def __init__(self, tags: Callable[[Any, Dict[str, Any]], Iterable[str]], ttl: int = FIELD_CACHE_TTL):
+        self.tags = tags
+        self.ttl = ttl
+
+    def apply(self, field):
+        self.field = field
+
+    async def resolve_async(self, next_, source, info, **kwargs):
+        cache = RedisCache()
+        arguments = hashlib.sha1(json.dumps(kwargs, sort_keys=True, default=str).encode()).hexdigest()
+        key = f"fieldcache:{info.path.typename}.{info.field_name}:{arguments}"
+        try:
+            cached = await cache.aget(key)
+            if cached is not None:
+                return load_result(self.field.type, cached["value"])
+            epoch = await cache.atag_epoch()
+        except RedisError as e:
+            # Serve uncached rather than fail the field while Redis is down
+            print(f"Field cache unavailable: {e}")
+            return await next_(source, info, **kwargs)
+
+        result = await next_(source, info, **kwargs)
+        if result:
+            try:
+                await cache.aset_tagged(key, {"value": dump_result(result)}, self.tags(result, kwargs), epoch, self.ttl)
+            except RedisError as e:
+                print(f"Field cache unavailable: {e}")
+        return result
@@ -1,13 +1,34 @@
 import strawberry
+from strawberry.extensions import ParserCache, ValidationCache, QueryDepthLimiter
 from typing import List, Tuple, Optional, Dict, Any
 from datetime import datetime
 from ..database.models import User as UserModel, Topic as TopicModel, Comment as CommentModel
 from strawberry.types import Info
-from ..database.database import get_db
+from ..database.database import SessionLocal
 from sqlalchemy.future import select
 import heapq
 from sqlalchemy import func
 from ..redis.redis import RedisCache
+from ..fastapi.operations import SearchOperations, MAX_SEARCH_PAGE_SIZE, SUGGEST_TOP_K, topic_trie
+from ..redis.trending import TrendingEngine, WINDOWS, ALL_TIME, TRENDING_CACHE_NAMESPACE, WINDOW_CACHE_TTL, MAX_TRENDING_LIMIT
+from .extensions import QueryCostLimiter, CacheField
+import base64
+
+COMMENTS_PAGE_SIZE = 20
+MAX_COMMENTS_PAGE_SIZE = 100
+
+def encode_comment_cursor(id: int) -> str:
+    # Opaque keyset cursor pointing just past the comment with this id
+    return base64.urlsafe_b64encode(f"comment:{id}".encode()).decode()
+
+def decode_comment_cursor(cursor: str) -> int:
+    try:
+        kind, id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+        if kind != "comment":
+            raise ValueError
+        return int(id)
+    except ValueError:
+        raise ValueError("Invalid cursor")
 
 @strawberry.type
 class User:
@@ -17,6 +38,11 @@ class User:
     profile_image: Optional[str] 
     created_at: Optional[datetime]
 
+    @strawberry.field
+    async def topics(self, info: Info) -> List['Topic']:
+        topics = await info.context["loaders"].topics_by_user.load(self.id)
+        return [topic_from_model(topic) for topic in topics]
+
 @strawberry.type
 class User_Topics:
     count :int
@@ -28,12 +54,73 @@ class Topic:
     title: str
     content: str
     user_id: int
+    comment_count: int = 0
+    last_activity_at: Optional[datetime] = None
+    created_at: Optional[datetime] = None
+
+    @strawberry.field
+    async def owner(self, info: Info) -> Optional[User]:
+        owner = await info.context["loaders"].users.load(self.user_id)
+        return user_from_model(owner) if owner else None
+
+    @strawberry.field
+    async def comments(self, info: Info, first: int=COMMENTS_PAGE_SIZE) -> 'CommentConnection':
+        # First page only, continue with Query.comments(after: pageInfo.endCursor)
+        first = max(1, min(first, MAX_COMMENTS_PAGE_SIZE))
+        rows = await info.context["loaders"].comment_pages.load((self.id, first + 1))
+        return comment_connection(rows, first, self.comment_count)
 
 @strawberry.type
 class Comment:
     id: int
     content: str
     user_id: int
+    created_at: Optional[datetime] = None
+
+    @strawberry.field
+    async def author(self, info: Info) -> Optional[User]:
+        author = await info.context["loaders"].users.load(self.user_id)
+        return user_from_model(author) if author else None
+
+@strawberry.type
+class PageInfo:
+    has_next_page: bool
+    end_cursor: Optional[str]
+
+@strawberry.type
+class CommentEdge:
+    cursor: str
+    node: Comment
+
+@strawberry.type
+class CommentConnection:
+    edges: List[CommentEdge]
+    page_info: PageInfo
+    total_count: int
+
+
+# Nested fields resolve through the per-request DataLoaders in info.context
+# (see loaders.py), so a page of topics costs one query per level, not per row
+def user_from_model(user: UserModel) -> User:
+    return User(id=user.id, name=user.name, email=user.email, profile_image=user.profile_image, created_at=user.created_at)
+
+def topic_from_model(topic: TopicModel) -> Topic:
+    return Topic(
+        id=topic.id, title=topic.title, content=topic.content, user_id=topic.user_id,
+        comment_count=topic.comment_count, last_activity_at=topic.last_activity_at, created_at=topic.created_at,
+    )
+
+def comment_from_model(comment: CommentModel) -> Comment:
+    return Comment(id=comment.id, content=comment.content, user_id=comment.user_id, created_at=comment.created_at)
+
+def comment_connection(rows, first: int, total: int) -> CommentConnection:
+    # rows holds up to first + 1 comments, the extra one only tells whether a next page exists
+    edges = [CommentEdge(cursor=encode_comment_cursor(row.id), node=comment_from_model(row)) for row in rows[:first]]
+    return CommentConnection(
+        edges=edges,
+        page_info=PageInfo(has_next_page=len(rows) > first, end_cursor=edges[-1].cursor if edges else None),
+        total_count=total,
+    )
 
 @strawberry.type
 class Trend:
@@ -54,10 +141,27 @@ class Trend:
         return self.count == other.count
 
 
+@strawberry.type
+class SearchHit:
+    id: int
+    kind: str
+    topic_id: int
+    user_id: int
+    title: Optional[str]
+    title_highlight: Optional[str]
+    snippet: str
+    rank: float
+
+@strawberry.type
+class SearchResults:
+    results: List[SearchHit]
+    next_offset: Optional[int]
+
 
-def get_user_details(info: Info, username: str) -> User:
-    with get_db() as db:
-        result = db.execute(select(UserModel).where(UserModel.name == username))
+
+async def get_user_details(info: Info, username: str) -> User:
+    async with SessionLocal() as db:
+        result = await db.execute(select(UserModel).where(UserModel.name == username))
         user = result.scalars().first()
         if user:
             return User(
@@ -69,57 +173,78 @@ def get_user_details(info: Info, username: str) -> User:
             )
         return None
 
-def get_user_topics(info: Info, user_id: int) -> User_Topics:
-    with get_db() as db:
+async def get_user_topics(info: Info, user_id: int) -> User_Topics:
+    async with SessionLocal() as db:
         # Fetch the count of topics
-        topic_count_result = db.execute(
+        topic_count_result = await db.execute(
             select(func.count(TopicModel.id)).where(TopicModel.user_id == user_id)
         )
         topic_count = topic_count_result.scalar()
 
         # Fetch the topic details
-        topic_details_result = db.execute(
+        topic_details_result = await db.execute(
             select(TopicModel).where(TopicModel.user_id == user_id)
         )
         topics = topic_details_result.scalars().all()
 
         # Map the topics to the Topic type
-        topic_details = [
-            Topic(id=topic.id, title=topic.title, content=topic.content, user_id=topic.user_id)
-            for topic in topics
-        ]
+        topic_details = [topic_from_model(topic) for topic in topics]
 
         # Return a User object with count and topics
         return User_Topics(count=topic_count, topics=topic_details)
     
 
-def get_topic(info: Info, prefix: str) -> List[Topic]:
-    with get_db() as db:
-        result = db.execute(
+async def get_topic(info: Info, prefix: str) -> List[Topic]:
+    async with SessionLocal() as db:
+        result = await db.execute(
             select(TopicModel).where(TopicModel.title.like(f"{prefix}%"))
         )
         topics = result.scalars().all()
-        return [
-            Topic(id=topic.id, title=topic.title, content=topic.content, user_id=topic.user_id)
-            for topic in topics
-        ]
+        return [topic_from_model(topic) for topic in topics]
         
         
         
-def get_comment(info: Info, topic_id: int) -> Comment:
-    with get_db() as db:
-        result = db.execute(select(CommentModel).where(CommentModel.topic_id == topic_id))
+async def suggest(info: Info, prefix: str, k: int=SUGGEST_TOP_K) -> List[str]:
+    # Autocomplete from the in-memory title trie, most commented topics first
+    if not prefix:
+        return []
+    return topic_trie.suggest(prefix, max(1, k))
+
+
+async def get_comment(info: Info, topic_id: int) -> Optional[Comment]:
+    async with SessionLocal() as db:
+        result = await db.execute(
+            select(CommentModel).where(CommentModel.topic_id == topic_id).order_by(CommentModel.id).limit(1)
+        )
         comment = result.scalars().first()
-        return Comment(id=comment.id, content=comment.content, user_id=comment.user_id)
+        return comment_from_model(comment) if comment else None
+
+
+async def get_comments(info: Info, topic_id: int, first: int=COMMENTS_PAGE_SIZE, after: Optional[str]=None) -> CommentConnection:
+    # Keyset pagination on the (topic_id, id) index: every page is an index range
+    # scan of first + 1 rows, however deep into the thread it starts
+    first = max(1, min(first, MAX_COMMENTS_PAGE_SIZE))
+    query = select(CommentModel).where(CommentModel.topic_id == topic_id)
+    if after:
+        query = query.where(CommentModel.id > decode_comment_cursor(after))
+    async with SessionLocal() as db:
+        result = await db.execute(query.order_by(CommentModel.id).limit(first + 1))
+        rows = result.scalars().all()
+        total = (await db.execute(select(TopicModel.comment_count).where(TopicModel.id == topic_id))).scalar()
+    return comment_connection(rows, first, total or 0)
 
 
 
-def get_trending_topics(info: Info, limit: int=10) -> List[Trend]:
+async def get_trending_topics(info: Info, limit: int=10, window: str=ALL_TIME) -> List[Trend]:
+    if window != ALL_TIME and window not in WINDOWS:
+        raise ValueError(f"Unknown trending window {window!r}, expected one of: {ALL_TIME}, {', '.join(WINDOWS)}")
+    limit = max(1, min(limit, MAX_TRENDING_LIMIT))
+
     cache = RedisCache()
-    cache_key = f"trending_topics:{limit}"
+    cache_key = f"{window}:{limit}"
     
     # Try to get from cache
-    cached_trends = cache.get(cache_key)
+    cached_trends = await cache.aget_namespaced(TRENDING_CACHE_NAMESPACE, cache_key)
     if cached_trends:
         return [
             Trend(
@@ -131,34 +256,31 @@ def get_trending_topics(info: Info, limit: int=10) -> List[Trend]:
             for trend in cached_trends
         ]
     
-    # If not in cache, query database
-    with get_db() as db:
-        trending_query = db.execute(
-            select(
-                TopicModel.id, 
-                TopicModel.title, 
-                TopicModel.content,
-                func.count(CommentModel.id).label('comment_count') #group and aggregate
-            )
-            .outerjoin(CommentModel, TopicModel.id == CommentModel.topic_id)  #join tables (outer join)
-            .group_by(TopicModel.id, TopicModel.title, TopicModel.content)
-            .order_by(func.count(CommentModel.id).desc())  #order by comment count in descending order
-            .limit(limit)
+    # Scores are maintained incrementally in Redis, Postgres is only asked for
+    # the topic rows of the winners in a single batched lookup
+    scores = await TrendingEngine().top(window, limit)
+    if not scores:
+        return []
+    async with SessionLocal() as db:
+        result = await db.execute(
+            select(TopicModel).where(TopicModel.id.in_([topic_id for topic_id, _ in scores]))
         )
+        topics = {topic.id: topic for topic in result.scalars().all()}
         
-        # Create trending topics list directly from query results
+        # Keep the ranking order, skipping topics deleted since they were scored
         trending = [
             Trend(
                 id=topic_id,
-                title=title,
-                content=content,
-                count=comment_count
+                title=topics[topic_id].title,
+                content=topics[topic_id].content,
+                count=round(score)
             )
-            for topic_id, title, content, comment_count in trending_query.all()
+            for topic_id, score in scores if topic_id in topics
         ]
         
-        # Cache the results
-        cache.set(cache_key, [
+        # Cache the results, no longer than the merged window they came from is
+        # reused, which also bounds a result computed just before a write
+        await cache.aset_namespaced(TRENDING_CACHE_NAMESPACE, cache_key, [
             {
                 "id": trend.id,
                 "title": trend.title,
@@ -166,16 +288,64 @@ def get_trending_topics(info: Info, limit: int=10) -> List[Trend]:
                 "count": trend.count
             }
             for trend in trending
-        ])
+        ], expire=WINDOW_CACHE_TTL)
         
         return trending
 
+async def search(info: Info, query: str, first: int=10, offset: int=0, scope: str="topics") -> SearchResults:
+    if scope not in ("topics", "comments"):
+        raise ValueError("scope must be 'topics' or 'comments'")
+    first = max(1, min(first, MAX_SEARCH_PAGE_SIZE))
+    offset = max(0, offset)
+    async with SessionLocal() as db:
+        if scope == "comments":
+            page = await SearchOperations.search_comments(query, db, None, first, offset)
+            hits = [
+                SearchHit(id=hit["id"], kind="comment", topic_id=hit["topic_id"], user_id=hit["user_id"],
+                          title=None, title_highlight=None, snippet=hit["snippet"], rank=hit["rank"])
+                for hit in page["results"]
+            ]
+        else:
+            page = await SearchOperations.search_topics(query, db, None, first, offset)
+            hits = [
+                SearchHit(id=hit["id"], kind="topic", topic_id=hit["id"], user_id=hit["user_id"],
+                          title=hit["title"], title_highlight=hit["title_highlight"], snippet=hit["snippet"], rank=hit["rank"])
+                for hit in page["results"]
+            ]
+        return SearchResults(results=hits, next_offset=page["next_offset"])
+
 @strawberry.type
 class Query:
-    user: User = strawberry.field(resolver=get_user_details)
-    userTopics: User_Topics = strawberry.field(resolver=get_user_topics)
-    topic: List[Topic] = strawberry.field(resolver=get_topic)
-    comment: Comment = strawberry.field(resolver=get_comment)
+    # Cached per arguments in Redis, tagged with the entities each result was built from
+    user: User = strawberry.field(resolver=get_user_details, extensions=[
+        CacheField(tags=lambda user, args: [f"user:{user.id}"]),
+    ])
+    userTopics: User_Topics = strawberry.field(resolver=get_user_topics, extensions=[
+        CacheField(tags=lambda result, args: [f"user:{args['user_id']}"] + [f"topic:{topic.id}" for topic in result.topics]),
+    ])
+    topic: List[Topic] = strawberry.field(resolver=get_topic, extensions=[
+        CacheField(tags=lambda topics, args: ["topics"] + [f"topic:{topic.id}" for topic in topics]),
+    ])
+    comment: Optional[Comment] = strawberry.field(resolver=get_comment, extensions=[
+        CacheField(tags=lambda comment, args: [f"topic:{args['topic_id']}", f"comment:{comment.id}"]),
+    ])
+    comments: CommentConnection = strawberry.field(resolver=get_comments, extensions=[
+        CacheField(tags=lambda page, args: [f"topic:{args['topic_id']}"] + [f"comment:{edge.node.id}" for edge in page.edges]),
+    ])
     trend: List[Trend] = strawberry.field(resolver=get_trending_topics)
+    search: SearchResults = strawberry.field(resolver=search)
+    suggest: List[str] = strawberry.field(resolver=suggest)
+
+# The client sends the same few documents over and over, so parsing and
+# validation results are cached per query string. Depth and cost limits run
+# before any resolver, nested fields make it easy to ask for a lot of rows.
+DOCUMENT_CACHE_SIZE = 256
+MAX_QUERY_DEPTH = 6
+MAX_QUERY_COST = 2000
 
-schema = strawberry.Schema(query=Query)
\ No newline at end of file
+schema = strawberry.Schema(query=Query, extensions=[
+    ParserCache(maxsize=DOCUMENT_CACHE_SIZE),
+    ValidationCache(maxsize=DOCUMENT_CACHE_SIZE),
+    QueryDepthLimiter(max_depth=MAX_QUERY_DEPTH),
+    QueryCostLimiter(max_cost=MAX_QUERY_COST),
+])
\ No newline at end of file
@@ -0,0 +1,69 @@
+from collections import defaultdict
+from typing import List, Tuple
+from strawberry.dataloader import DataLoader
+from sqlalchemy import true
+from sqlalchemy.future import select
+from ..database.database import SessionLocal
+from ..database.models import User as UserModel, Topic as TopicModel, Comment as CommentModel
+
+# Every loader collects the keys requested while one GraphQL request resolves
+# a level of the tree and fetches them with a single IN query. Batches open
+# their own session because loaders of different fields run concurrently.
+
+
+async def load_users(ids: List[int]):
+    async with SessionLocal() as db:
+        users = (await db.execute(select(UserModel).where(UserModel.id.in_(ids)))).scalars().all()
+    by_id = {user.id: user for user in users}
+    return [by_id.get(id) for id in ids]
+
+
+async def load_topics_by_user(user_ids: List[int]):
+    async with SessionLocal() as db:
+        topics = (await db.execute(
+            select(TopicModel).where(TopicModel.user_id.in_(user_ids)).order_by(TopicModel.id)
+        )).scalars().all()
+    by_user = defaultdict(list)
+    for topic in topics:
+        by_user[topic.user_id].append(topic)
+    return [by_user[user_id] for user_id in user_ids]
+
+
+async def load_comment_pages(keys: List[Tuple[int, int]]):
+    # keys are (topic_id, limit): the first limit comments of each topic, read
+    # with one LATERAL join that walks ix_comments_topic_id_id once per topic
+    # instead of loading whole threads
+    by_key = {}
+    limits = defaultdict(list)
+    for topic_id, limit in keys:
+        limits[limit].append(topic_id)
+    async with SessionLocal() as db:
+        for limit, topic_ids in limits.items():
+            topics = select(TopicModel.id).where(TopicModel.id.in_(topic_ids)).subquery()
+            page = (
+                select(CommentModel.id, CommentModel.content, CommentModel.user_id, CommentModel.topic_id, CommentModel.created_at)
+                .where(CommentModel.topic_id == topics.c.id)
+                .order_by(CommentModel.id)
+                .limit(limit)
+                .lateral()
+            )
+            rows = (await db.execute(
+                select(page).select_from(topics.join(page, true())).order_by(page.c.topic_id, page.c.id)
+            )).all()
+            for topic_id in topic_ids:
+                by_key[(topic_id, limit)] = []
+            for row in rows:
+                by_key[(row.topic_id, limit)].append(row)
+    return [by_key[key] for key in keys]
+
+
+class Loaders:
+    # Created per request, so cached rows never outlive the request
+    def __init__(self):
+        self.users = DataLoader(load_fn=load_users)
+        self.topics_by_user = DataLoader(load_fn=load_topics_by_user)
+        self.comment_pages = DataLoader(load_fn=load_comment_pages)
+
+
+async def get_context():
+    return {"loaders": Loaders()}
@@ -0,0 +1,118 @@
+import hashlib
+import json
+from collections import OrderedDict
+from dataclasses import replace
+from typing import Optional
+from graphql import ExecutionResult, GraphQLError
+from redis.exceptions import RedisError
+from strawberry.fastapi import GraphQLRouter
+from strawberry.http import GraphQLRequestData
+from strawberry.http.exceptions import HTTPException
+from strawberry.http.parse_content_type import parse_content_type
+from ..redis.redis import RedisCache
+
+# Automatic persisted queries: a client sends only the sha256 of a document in
+# extensions.persistedQuery.sha256Hash. An unknown hash is answered with
+# PersistedQueryNotFound, the client retries once with the full query and
+# every later request for that document can be sent as the hash alone.
+PERSISTED_QUERY_PREFIX = "graphql:pq:"
+PERSISTED_QUERY_TTL = 30 * 24 * 3600   # refreshed whenever a client re-registers
+PERSISTED_QUERY_CACHE_SIZE = 500       # documents kept in memory per worker
+
+
+class PersistedQueryStore:
+    # Redis shares registrations between workers, a small LRU saves the round trip
+
+    def __init__(self, maxsize: int = PERSISTED_QUERY_CACHE_SIZE):
+        self.maxsize = maxsize
+        self.local = OrderedDict()
+
+    async def get(self, sha256: str) -> Optional[str]:
+        query = self.local.get(sha256)
+        if query is None:
+            try:
+                query = await RedisCache().async_client.get(PERSISTED_QUERY_PREFIX + sha256)
+            except RedisError as e:
+                # A miss: the client resends the full query
+                print(f"Persisted query store unavailable: {e}")
+                return None
+            if query is None:
+                return None
+        self._remember(sha256, query)
+        return query
+
+    async def put(self, sha256: str, query: str):
+        self._remember(sha256, query)
+        try:
+            await RedisCache().async_client.set(PERSISTED_QUERY_PREFIX + sha256, query, ex=PERSISTED_QUERY_TTL)
+        except RedisError as e:
+            print(f"Persisted query store unavailable: {e}")
+
+    def _remember(self, sha256: str, query: str):
+        self.local[sha256] = query
+        self.local.move_to_end(sha256)
+        if len(self.local) > self.maxsize:
+            self.local.popitem(last=False)
+
+
+persisted_queries = PersistedQueryStore()
+
+
+class PersistedQueryNotFound(Exception):
+    # Answered as a GraphQL error, which is what tells APQ clients to resend the full query
+    pass
+
+
+async def resolve_persisted_query(request_data: GraphQLRequestData, extensions) -> GraphQLRequestData:
+    if isinstance(extensions, str):  # GET requests carry it JSON-encoded
+        try:
+            extensions = json.loads(extensions)
+        except ValueError:
+            raise HTTPException(400, "extensions is not valid JSON")
+    if extensions is not None and not isinstance(extensions, dict):
+        raise HTTPException(400, "extensions must be a JSON object")
+    persisted = (extensions or {}).get("persistedQuery")
+    if not persisted:
+        return request_data
+    if not isinstance(persisted, dict):
+        raise HTTPException(400, "persistedQuery must be a JSON object")
+
+    sha256 = persisted.get("sha256Hash")
+    if not sha256:
+        raise HTTPException(400, "persistedQuery requires a sha256Hash")
+    if request_data.query:
+        if hashlib.sha256(request_data.query.encode()).hexdigest() != sha256:
+            raise HTTPException(400, "provided sha does not match query")
+        await persisted_queries.put(sha256, request_data.query)
+        return request_data
+
+    query = await persisted_queries.get(sha256)
+    if query is None:
+        raise PersistedQueryNotFound()
+    return replace(request_data, query=query)
+
+
+class PersistedQueryRouter(GraphQLRouter):
+    # Fills in the query of hash-only requests before strawberry parses them
+
+    async def execute_operation(self, request, context, root_value):
+        try:
+            return await super().execute_operation(request, context, root_value)
+        except PersistedQueryNotFound:
+            return ExecutionResult(data=None, errors=[
+                GraphQLError("PersistedQueryNotFound", extensions={"code": "PERSISTED_QUERY_NOT_FOUND"}),
+            ])
+
+    async def parse_http_body(self, request):
+        # Only the top-level request carries extensions. parse_json also reads
+        # variables and multipart operations/map, which must be left as sent,
+        # and multipart uploads always send the full query.
+        request_data = await super().parse_http_body(request)
+        if request.method == "GET":
+            extensions = request.query_params.get("extensions")
+        elif "application/json" in parse_content_type(request.content_type or "")[0]:
+            body = self.parse_json(await request.get_body())   # the body is read once and cached
+            extensions = body.get("extensions") if isinstance(body, dict) else None
+        else:
+            return request_data
+        return await resolve_persisted_query(request_data, extensions)
@@ -3,32 +3,61 @@ from fastapi.staticfiles import StaticFiles
 from pathlib import Path
 from .fastapi.api import router as api_router
 from .fastapi.auth import router as auth_router
-from .database.database import init_db
+from .fastapi.passwords import password_hasher
+from .fastapi.admission import AdmissionControlMiddleware
+from .database.database import init_db, SessionLocal
+from .database.partitions import ensure_partitions, maintain_partitions
 from .graphql.graphql_schema import schema
-from strawberry.fastapi import GraphQLRouter
-from .rabbitmq.rabbitmq import consume_messages
-import threading
+from .graphql.loaders import get_context as get_graphql_context
+from .graphql.persisted_queries import PersistedQueryRouter
+from .fastapi.websocket import router as ws_router, manager as notification_manager
+from .rabbitmq.rabbitmq import publisher
+from .redis.trending import TrendingEngine
+from .redis.search_index import index_replicator
+from .redis.principals import principal_cache
+from .redis.revocation import revocation_list
+import asyncio
 
 app = FastAPI()
+# Token-bucket rate limits and per-route-class concurrency caps, see admission.py
+app.add_middleware(AdmissionControlMiddleware)
 
 @app.on_event("startup")
-def startup_event():
-    init_db()
-    threading.Thread(target=notification_listener, daemon=True).start()
+async def startup_event():
+    await init_db()
+    # Comments and notifications can only be inserted into months that have a partition
+    async with SessionLocal() as db:
+        await ensure_partitions(db)
+    app.state.partition_maintenance = asyncio.create_task(maintain_partitions(SessionLocal))
+    await publisher.start()
+    # Seed the trending scores on a fresh Redis, python -m Backend.redis.trending reconciles later on
+    trending = TrendingEngine()
+    if not await trending.has_scores():
+        async with SessionLocal() as db:
+            await trending.rebuild(db)
+    # Search structures answer from memory: load them before serving, then
+    # follow the index event stream so writes on other workers show up here
+    async with SessionLocal() as db:
+        await index_replicator.rebuild(db)
+    app.state.index_sync = asyncio.create_task(index_replicator.listen(SessionLocal))
+    # Relays notifications published by any worker to this worker's sockets
+    app.state.notification_push = asyncio.create_task(notification_manager.listen())
+    # Revoked tokens must be known before the first request is authenticated
+    await revocation_list.rebuild()
+    app.state.revocation_sync = asyncio.create_task(revocation_list.listen())
+    # Drops cached principals invalidated by writes on other workers
+    app.state.principal_sync = asyncio.create_task(principal_cache.listen())
 
-def notification_listener():
-    def handle_message(message):
-        print(f"Received message: {message}")
-        # Implement logic to handle the message
-
-    consume_messages("topic_queue", handle_message)
-    consume_messages("user_queue", handle_message)
-    
+@app.on_event("shutdown")
+async def shutdown_event():
+    await publisher.stop()
+    password_hasher.stop()
 
 app.include_router(auth_router, prefix="/auth")
 app.include_router(api_router, prefix="/api")
+app.include_router(ws_router, prefix="/ws")
 
-graphql_app = GraphQLRouter(schema)
+graphql_app = PersistedQueryRouter(schema, context_getter=get_graphql_context)
 app.include_router(graphql_app, prefix="/graphql")
 
 # Mount the uploads directory
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import os
+import aio_pika
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+from .rabbitmq import RABBITMQ_URL, TOPIC_QUEUE, USER_QUEUE, declare_queue, declare_dead_letters
+from ..database.database import SessionLocal
+from ..database.models import Notification
+from ..database.partitions import ensure_partitions
+from ..fastapi.websocket import manager, serialize_notification
+from ..redis.inbox import NotificationInbox
+
+# Run with: python -m Backend.rabbitmq.consumer
+CONSUMER_QUEUES = (TOPIC_QUEUE, USER_QUEUE)
+CONSUMER_CONCURRENCY = int(os.getenv("CONSUMER_CONCURRENCY", "4"))   # workers, one channel each
+CONSUMER_PREFETCH = int(os.getenv("CONSUMER_PREFETCH", "200"))       # unacked messages per worker
+CONSUMER_BATCH_SIZE = int(os.getenv("CONSUMER_BATCH_SIZE", "100"))   # messages per insert/ack
+CONSUMER_BATCH_TIMEOUT = float(os.getenv("CONSUMER_BATCH_TIMEOUT", "0.2"))  # seconds to fill a batch
+CONSUMER_RETRY_DELAY = 1
+CONSUMER_BATCH_ATTEMPTS = 3    # tries of a batch insert before storing its messages one by one
+
+# Raised for the rows themselves (a recipient deleted while its event was
+# queued, a value out of range): retrying cannot help
+REJECTED_ROW_ERRORS = (IntegrityError, DataError)
+
+# A message that cannot be turned into rows, bound for the dead-letter queue
+class UnprocessableMessage(Exception):
+    pass
+
+
+def comment_created(event: dict):
+    # Notify the topic owner, but not when they comment on their own topic
+    if event["topic_owner_id"] == event["user_id"]:
+        return []
+    return [{
+        "user_id": event["topic_owner_id"],
+        "message": f"{event['author_name']} commented on your topic: {event['topic_title']}",
+    }]
+
+
+# event name -> function returning the notification rows it produces
+EVENT_HANDLERS = {
+    "comment_created": comment_created,
+}
+
+
+def notifications_for(message: aio_pika.abc.AbstractIncomingMessage):
+    try:
+        event = json.loads(message.body)
+    except ValueError:
+        print(f"Skipping malformed message on {message.routing_key}: {message.body[:100]!r}")
+        return []
+    handler = EVENT_HANDLERS.get(event.get("event"))
+    if handler is None:
+        return []
+    try:
+        return handler(event)
+    except (KeyError, TypeError) as e:
+        raise UnprocessableMessage(f"{event.get('event')} event without {e}")
+
+
+async def store(rows):
+    if not rows:
+        return []
+    async with SessionLocal() as db:
+        created = (await db.scalars(insert(Notification).returning(Notification), rows)).all()
+        await db.commit()
+    return created
+
+
+class NotificationWorker:
+    """
+    Owns one channel consuming every queue. Deliveries are buffered locally,
+    turned into notification rows one batch at a time with a single INSERT,
+    and acknowledged together once that insert has committed. A batch that
+    keeps failing is stored message by message, and the messages whose rows
+    are rejected are dead-lettered instead of blocking the queue.
+    """
+
+    def __init__(self, connection: aio_pika.abc.AbstractRobustConnection):
+        self.connection = connection
+        self.pending = asyncio.Queue()
+        self.dead_letters = None
+
+    async def run(self):
+        channel = await self.connection.channel()
+        await channel.set_qos(prefetch_count=CONSUMER_PREFETCH)
+        self.dead_letters = await declare_dead_letters(channel)
+        for queue_name in CONSUMER_QUEUES:
+            queue = await declare_queue(channel, queue_name)
+            await queue.consume(self.pending.put)
+        while True:
+            batch = await self.next_batch()
+            await self.process(batch)
+
+    async def next_batch(self):
+        batch = [await self.pending.get()]
+        deadline = asyncio.get_running_loop().time() + CONSUMER_BATCH_TIMEOUT
+        while len(batch) < CONSUMER_BATCH_SIZE:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.pending.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def process(self, batch):
+        parsed = []
+        for message in batch:
+            try:
+                parsed.append((message, notifications_for(message)))
+            except UnprocessableMessage as e:
+                await self.dead_letter(message, e)
+        if not parsed:
+            return
+        rows = [row for _, message_rows in parsed for row in message_rows]
+
+        for attempt in range(1, CONSUMER_BATCH_ATTEMPTS + 1):
+            try:
+                created = await store(rows)
+            except REJECTED_ROW_ERRORS as e:
+                print(f"Batch of {len(rows)} notifications rejected: {e}")
+                break
+            except Exception as e:
+                print(f"Failed to store {len(rows)} notifications (attempt {attempt}): {e}")
+                await asyncio.sleep(CONSUMER_RETRY_DELAY)
+            else:
+                # Delivery tags on a channel are increasing, so this covers the whole batch
+                await parsed[-1][0].ack(multiple=True)
+                await self.deliver(created)
+                return
+        # The batch as a whole keeps failing, find the messages at fault
+        await self.deliver(await self.process_one_by_one(parsed))
+
+    async def process_one_by_one(self, parsed):
+        created = []
+        for index, (message, rows) in enumerate(parsed):
+            try:
+                created += await store(rows)
+            except REJECTED_ROW_ERRORS as e:
+                await self.dead_letter(message, e)
+                continue
+            except Exception as e:
+                # Still failing for reasons other than the rows, most likely
+                # the database itself: hand the rest back to the broker
+                print(f"Failed to store notifications, requeueing {len(parsed) - index} messages: {e}")
+                for pending, _ in parsed[index:]:
+                    await pending.nack(requeue=True)
+                await asyncio.sleep(CONSUMER_RETRY_DELAY)
+                break
+            await message.ack()
+        return created
+
+    async def dead_letter(self, message: aio_pika.abc.AbstractIncomingMessage, reason: Exception):
+        # Copied to the dead-letter exchange before the ack, the channel is in
+        # confirm mode so the copy is on the broker by then
+        print(f"Dead-lettering message on {message.routing_key}: {reason}")
+        await self.dead_letters.publish(
+            aio_pika.Message(
+                message.body,
+                headers={**(message.headers or {}), "x-original-queue": message.routing_key, "x-reason": str(reason)[:500]},
+                delivery_mode=aio_pika.DeliveryMode.PERSISTENT,
+            ),
+            routing_key=message.routing_key or "",
+        )
+        await message.ack()
+
+    async def deliver(self, created):
+        if not created:
+            return
+        try:
+            await NotificationInbox().add_many(created)
+        except Exception as e:
+            # The rows are stored and acknowledged, inboxes rebuild from Postgres on a miss
+            print(f"Failed to update notification inboxes: {e}")
+        for notification in created:
+            await manager.notify(notification.user_id, {
+                "type": "notification",
+                "notification": serialize_notification(notification),
+            })
+
+
+async def main():
+    # May run before any API worker has created this month's partition
+    async with SessionLocal() as db:
+        await ensure_partitions(db)
+    connection = await aio_pika.connect_robust(RABBITMQ_URL)
+    async with connection:
+        workers = [NotificationWorker(connection) for _ in range(CONSUMER_CONCURRENCY)]
+        await asyncio.gather(*(worker.run() for worker in workers))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
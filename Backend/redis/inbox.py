@@ -0,0 +1,154 @@
+from typing import Iterable, Optional
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from .redis import RedisCache
+from ..database.models import Notification
+
+INBOX_SIZE = 200            # recent notification ids kept per user
+INBOX_TTL = 7 * 24 * 3600   # idle inboxes expire and are rebuilt on the next read
+
+# Every change to an inbox bumps its version, even when the inbox is missing.
+# A rebuild reads the version before querying Postgres and only writes if it
+# has not moved, so a notification added or marked read meanwhile is never
+# overwritten by the older count (the same idea as RedisCache.set_tagged).
+#
+# Only touch an inbox that already exists: a missing one is rebuilt from
+# Postgres on the next read, and starting a counter at 1 here would hide the
+# unread notifications it does not know about.
+ADD_SCRIPT = """
+redis.call('INCR', KEYS[3])
+redis.call('EXPIRE', KEYS[3], ARGV[4])
+if redis.call('EXISTS', KEYS[2]) == 0 then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('ZREMRANGEBYRANK', KEYS[1], 0, -(tonumber(ARGV[3]) + 1))
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+redis.call('EXPIRE', KEYS[2], ARGV[4])
+return 1
+"""
+
+# A counter that would go negative has drifted: drop it for a rebuild
+MARK_READ_SCRIPT = """
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return -1
+end
+local unread = redis.call('DECRBY', KEYS[1], ARGV[1])
+if unread < 0 then
+    redis.call('DEL', KEYS[1])
+    return -1
+end
+return unread
+"""
+
+# ARGV: expected version, ttl, unread count, then id/score pairs of recent ids
+REBUILD_SCRIPT = """
+if (redis.call('GET', KEYS[3]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+for i = 4, #ARGV, 2 do
+    redis.call('ZADD', KEYS[1], ARGV[i + 1], ARGV[i])
+end
+if #ARGV > 3 then
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+redis.call('SET', KEYS[2], ARGV[3], 'EX', ARGV[2])
+return 1
+"""
+
+
+class NotificationInbox:
+    """
+    Per-user capped inbox: a sorted set of the most recent notification ids
+    (scored by creation time), an unread counter and a version.
+    """
+
+    def __init__(self):
+        # Used by request handlers and the consumer's event loop alike
+        self.redis_client = RedisCache().async_client
+        self._add = self.redis_client.register_script(ADD_SCRIPT)
+        self._mark_read = self.redis_client.register_script(MARK_READ_SCRIPT)
+        self._rebuild = self.redis_client.register_script(REBUILD_SCRIPT)
+
+    @staticmethod
+    def _keys(user_id: int):
+        return f"inbox:{user_id}:recent", f"inbox:{user_id}:unread", f"inbox:{user_id}:version"
+
+    async def add_many(self, notifications: Iterable[Notification]):
+        pipe = self.redis_client.pipeline(transaction=False)
+        for n in notifications:
+            await self._add(
+                keys=self._keys(n.user_id),
+                args=[n.id, n.created_at.timestamp(), INBOX_SIZE, INBOX_TTL],
+                client=pipe,
+            )
+        await pipe.execute()
+
+    async def mark_read(self, user_id: int, count: int):
+        # ids and watermarks come from notifications the client was shown,
+        # which add_many has already counted
+        if count:
+            _, unread_key, version_key = self._keys(user_id)
+            await self._mark_read(keys=[unread_key, version_key], args=[count, INBOX_TTL])
+
+    async def mark_all_read(self, user_id: int):
+        # The UPDATE may have marked notifications whose add_many has not run
+        # yet: a counter set to 0 here would be bumped by it afterwards. Drop
+        # the counter instead, the next read recounts from Postgres and adds
+        # landing in between find no inbox to touch.
+        _, unread_key, version_key = self._keys(user_id)
+        pipe = self.redis_client.pipeline()
+        pipe.delete(unread_key)
+        pipe.incr(version_key)
+        pipe.expire(version_key, INBOX_TTL)
+        await pipe.execute()
+
+    async def unread_count(self, user_id: int) -> Optional[int]:
+        _, unread_key, _ = self._keys(user_id)
+        value = await self.redis_client.get(unread_key)
+        return int(value) if value is not None else None
+
+    async def latest_id(self, user_id: int) -> Optional[int]:
+        recent_key, _, _ = self._keys(user_id)
+        latest = await self.redis_client.zrevrange(recent_key, 0, 0)
+        return int(latest[0]) if latest else None
+
+    async def version(self, user_id: int) -> str:
+        return await self.redis_client.get(self._keys(user_id)[2]) or "0"
+
+    async def rebuild(self, user_id: int, unread: int, recent: Iterable[tuple], version: str) -> bool:
+        # False when the inbox changed since version was read, nothing is written then
+        args = [version, INBOX_TTL, unread]
+        for id, created_at in recent:
+            args += [id, created_at.timestamp()]
+        return bool(await self._rebuild(keys=self._keys(user_id), args=args))
+
+
+async def get_inbox_state(db: AsyncSession, user_id: int):
+    # Answer from Redis, and rebuild the inbox from Postgres on a miss
+    inbox = NotificationInbox()
+    unread = await inbox.unread_count(user_id)
+    if unread is not None:
+        return unread, await inbox.latest_id(user_id)
+
+    version = await inbox.version(user_id)
+    unread = (await db.execute(
+        select(func.count(Notification.id))
+        .where(Notification.user_id == user_id)
+        .where(Notification.is_read == False)
+    )).scalar()
+    recent = (await db.execute(
+        select(Notification.id, Notification.created_at)
+        .where(Notification.user_id == user_id)
+        .order_by(Notification.created_at.desc(), Notification.id.desc())
+        .limit(INBOX_SIZE)
+    )).all()
+    # A rebuild that lost to a concurrent change still answers with what
+    # Postgres said, the next read rebuilds again
+    await inbox.rebuild(user_id, unread, recent, version)
+    return unread, recent[0].id if recent else None
@@ -0,0 +1,112 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, asdict
+from typing import Optional
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+from .redis import RedisCache
+
+# get_current_user resolves the token subject (the user's email) to a small
+# snapshot of the user, looked up in memory first, then in Redis, and only
+# then in Postgres. Writes to a user publish on PRINCIPAL_CHANNEL, so every
+# worker drops its in-memory copy at once instead of waiting for the TTL.
+PRINCIPAL_PREFIX = "principal:"
+PRINCIPAL_CHANNEL = "principals:invalidate"
+PRINCIPAL_TTL = 300          # seconds in Redis
+PRINCIPAL_LOCAL_TTL = 30     # seconds in memory, bounds staleness if an invalidation is missed
+PRINCIPAL_CACHE_SIZE = 10000 # snapshots kept in memory per worker
+
+
+@dataclass(frozen=True)
+class Principal:
+    # What request handlers need from the authenticated user. Never holds the
+    # password hash, so nothing sensitive is copied into Redis.
+    id: int
+    name: str
+    email: str
+    profile_image: Optional[str] = None
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(id=user.id, name=user.name, email=user.email, profile_image=user.profile_image)
+
+
+class PrincipalCache:
+    def __init__(self, maxsize: int = PRINCIPAL_CACHE_SIZE, local_ttl: float = PRINCIPAL_LOCAL_TTL):
+        self.maxsize = maxsize
+        self.local_ttl = local_ttl
+        self.local = OrderedDict()   # sub -> (expires_at, Principal)
+
+    async def get(self, sub: str) -> Optional[Principal]:
+        entry = self.local.get(sub)
+        if entry is not None:
+            expires_at, principal = entry
+            if expires_at > time.monotonic():
+                self.local.move_to_end(sub)
+                return principal
+            del self.local[sub]
+
+        try:
+            data = await RedisCache().async_client.get(PRINCIPAL_PREFIX + sub)
+        except RedisError as e:
+            # A miss: the caller falls back to Postgres
+            print(f"Principal cache unavailable: {e}")
+            return None
+        if data is None:
+            return None
+        principal = Principal(**json.loads(data))
+        self._remember(sub, principal)
+        return principal
+
+    async def put(self, sub: str, principal: Principal):
+        self._remember(sub, principal)
+        try:
+            await RedisCache().async_client.set(PRINCIPAL_PREFIX + sub, json.dumps(asdict(principal)), ex=PRINCIPAL_TTL)
+        except RedisError as e:
+            print(f"Principal cache unavailable: {e}")
+
+    async def invalidate(self, *subs: str):
+        if not subs:
+            return
+        for sub in subs:
+            self.local.pop(sub, None)
+        pipe = RedisCache().async_client.pipeline(transaction=False)
+        pipe.delete(*(PRINCIPAL_PREFIX + sub for sub in subs))
+        pipe.publish(PRINCIPAL_CHANNEL, json.dumps(list(subs)))
+        try:
+            await pipe.execute()
+        except RedisError as e:
+            # Runs after the user's change is committed: other workers and
+            # Redis keep their copy for at most PRINCIPAL_LOCAL_TTL / PRINCIPAL_TTL
+            print(f"Principal cache unavailable: {e}")
+
+    def _remember(self, sub: str, principal: Principal):
+        self.local[sub] = (time.monotonic() + self.local_ttl, principal)
+        self.local.move_to_end(sub)
+        if len(self.local) > self.maxsize:
+            self.local.popitem(last=False)
+
+    async def listen(self):
+        # Drops snapshots invalidated by any worker from this worker's memory
+        client = aioredis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
+        while True:
+            try:
+                pubsub = client.pubsub()
+                await pubsub.subscribe(PRINCIPAL_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] != "message":
+                        continue
+                    for sub in json.loads(message["data"]):
+                        self.local.pop(sub, None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Principal cache listener error: {e}")
+                # Messages may have been missed while disconnected
+                self.local.clear()
+                await asyncio.sleep(1)
+
+
+principal_cache = PrincipalCache()
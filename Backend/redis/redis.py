@@ -1,6 +1,42 @@
+import os
 import redis
+import redis.asyncio as aioredis
 import json
-from typing import Any, Optional
+from typing import Any, Iterable, Optional
+
+TAG_EPOCH_KEY = "tags:epoch"
+
+# Without timeouts a stalled Redis hangs every caller instead of raising
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1.0"))
+REDIS_CONNECT_TIMEOUT = float(os.getenv("REDIS_CONNECT_TIMEOUT", "1.0"))
+
+# Store an entry and index it under each of its tag sets, unless some tag was
+# invalidated since the caller started computing the value (the epoch moved):
+# caching it then could resurrect data the invalidation meant to drop.
+SET_TAGGED_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[3] then
+    return 0
+end
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+for i = 3, #KEYS do
+    redis.call('SADD', KEYS[i], KEYS[1])
+    if redis.call('TTL', KEYS[i]) < tonumber(ARGV[2]) then
+        redis.call('EXPIRE', KEYS[i], ARGV[2])
+    end
+end
+return 1
+"""
+
+INVALIDATE_TAGS_SCRIPT = """
+redis.call('INCR', KEYS[1])
+for i = 2, #KEYS do
+    for _, key in ipairs(redis.call('SMEMBERS', KEYS[i])) do
+        redis.call('DEL', key)
+    end
+    redis.call('DEL', KEYS[i])
+end
+return 1
+"""
 
 class RedisCache:
     _instance = None
@@ -12,8 +48,23 @@ class RedisCache:
                 host='localhost',
                 port=6379,
                 db=0,
-                decode_responses=True
+                decode_responses=True,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+            )
+            # For request paths: waiting on it yields the event loop to other requests
+            cls._instance.async_client = aioredis.Redis(
+                host='localhost',
+                port=6379,
+                db=0,
+                decode_responses=True,
+                socket_timeout=REDIS_SOCKET_TIMEOUT,
+                socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
             )
+            cls._instance._set_tagged = cls._instance.redis_client.register_script(SET_TAGGED_SCRIPT)
+            cls._instance._invalidate_tags = cls._instance.redis_client.register_script(INVALIDATE_TAGS_SCRIPT)
+            cls._instance._aset_tagged = cls._instance.async_client.register_script(SET_TAGGED_SCRIPT)
+            cls._instance._ainvalidate_tags = cls._instance.async_client.register_script(INVALIDATE_TAGS_SCRIPT)
         return cls._instance
 
     def get(self, key: str) -> Optional[Any]:
@@ -22,6 +73,12 @@ class RedisCache:
             return json.loads(value)
         return None
 
+    async def aget(self, key: str) -> Optional[Any]:
+        value = await self.async_client.get(key)
+        if value:
+            return json.loads(value)
+        return None
+
     def set(self, key: str, value: Any, expire: int = 300):  # Default 5 minutes cache
         self.redis_client.setex(
             name=key,
@@ -29,6 +86,74 @@ class RedisCache:
             value=json.dumps(value)
         )
 
+    async def aset(self, key: str, value: Any, expire: int = 300):
+        await self.async_client.setex(name=key, time=expire, value=json.dumps(value))
+
+    # Namespaced entries embed the namespace's generation counter in their key.
+    # invalidate() bumps the counter with a single INCR, after which every
+    # existing entry of the namespace is unreachable and just ages out via TTL.
+    def _generation_key(self, namespace: str) -> str:
+        return f"ns:{namespace}:gen"
+
+    def namespaced_key(self, namespace: str, key: str) -> str:
+        generation = self.redis_client.get(self._generation_key(namespace)) or 0
+        return f"{namespace}:v{generation}:{key}"
+
+    async def anamespaced_key(self, namespace: str, key: str) -> str:
+        generation = await self.async_client.get(self._generation_key(namespace)) or 0
+        return f"{namespace}:v{generation}:{key}"
+
+    def get_namespaced(self, namespace: str, key: str) -> Optional[Any]:
+        return self.get(self.namespaced_key(namespace, key))
+
+    async def aget_namespaced(self, namespace: str, key: str) -> Optional[Any]:
+        return await self.aget(await self.anamespaced_key(namespace, key))
+
+    def set_namespaced(self, namespace: str, key: str, value: Any, expire: int = 300):
+        self.set(self.namespaced_key(namespace, key), value, expire)
+
+    async def aset_namespaced(self, namespace: str, key: str, value: Any, expire: int = 300):
+        await self.aset(await self.anamespaced_key(namespace, key), value, expire)
+
+    def invalidate(self, namespace: str):
+        self.redis_client.incr(self._generation_key(namespace))
+
+    async def ainvalidate(self, namespace: str):
+        await self.async_client.incr(self._generation_key(namespace))
+
+    # Tagged entries are indexed under the entities they were built from
+    # ("topic:42", "user:7"), and a write drops every entry tagged with what it
+    # changed. Read tag_epoch() before computing a value and pass it to
+    # set_tagged() so an invalidation in between is not undone.
+    def _tag_key(self, tag: str) -> str:
+        return f"tag:{tag}"
+
+    def tag_epoch(self) -> str:
+        return self.redis_client.get(TAG_EPOCH_KEY) or "0"
+
+    async def atag_epoch(self) -> str:
+        return await self.async_client.get(TAG_EPOCH_KEY) or "0"
+
+    def set_tagged(self, key: str, value: Any, tags: Iterable[str], epoch: str, expire: int = 300) -> bool:
+        keys = [key, TAG_EPOCH_KEY, *(self._tag_key(tag) for tag in set(tags))]
+        return bool(self._set_tagged(keys=keys, args=[json.dumps(value), expire, epoch]))
+
+    async def aset_tagged(self, key: str, value: Any, tags: Iterable[str], epoch: str, expire: int = 300) -> bool:
+        keys = [key, TAG_EPOCH_KEY, *(self._tag_key(tag) for tag in set(tags))]
+        return bool(await self._aset_tagged(keys=keys, args=[json.dumps(value), expire, epoch], client=self.async_client))
+
+    def invalidate_tags(self, *tags: str):
+        self._invalidate_tags(keys=[TAG_EPOCH_KEY, *(self._tag_key(tag) for tag in set(tags))])
+
+    async def ainvalidate_tags(self, *tags: str):
+        await self._ainvalidate_tags(keys=[TAG_EPOCH_KEY, *(self._tag_key(tag) for tag in set(tags))], client=self.async_client)
+
+    def publish(self, channel: str, value: Any):
+        self.redis_client.publish(channel, json.dumps(value))
+
+    async def apublish(self, channel: str, value: Any):
+        await self.async_client.publish(channel, json.dumps(value))
+
     def delete(self, key: str):
         self.redis_client.delete(key)
 
@@ -0,0 +1,100 @@
+import asyncio
+import time
+import redis.asyncio as aioredis
+from .redis import RedisCache
+from ..utils.structures import BloomFilter
+
+# Revoked token ids (jti) live in Redis until the token would have expired
+# anyway. Every worker mirrors them in a Bloom filter, so checking a token
+# that was never revoked, which is nearly every token, stays in memory. Only
+# filter hits (revoked tokens and rare false positives) ask Redis.
+REVOKED_PREFIX = "revoked:"
+REVOKED_INDEX = "revoked:index"         # sorted set jti -> expiry, read to rebuild filters
+REVOCATION_CHANNEL = "revocations"
+REVOCATION_FILTER_CAPACITY = 100000
+REVOCATION_FILTER_ERROR_RATE = 0.001
+REVOCATION_RESYNC_SECONDS = 60          # how often expired ids are checked for a rebuild
+REVOCATION_REBUILD_SLACK = 1000         # expired ids tolerated in a filter before rebuilding it
+
+
+class RevocationList:
+    def __init__(self):
+        self.filter = BloomFilter(REVOCATION_FILTER_CAPACITY, REVOCATION_FILTER_ERROR_RATE)
+
+    async def revoke(self, jti: str, expires_at: float):
+        ttl = int(expires_at - time.time()) + 1
+        if ttl <= 0:
+            return  # already expired, nothing left to revoke
+        self.filter.add(jti)
+        pipe = RedisCache().async_client.pipeline()
+        pipe.set(REVOKED_PREFIX + jti, 1, ex=ttl)
+        pipe.zadd(REVOKED_INDEX, {jti: expires_at})
+        pipe.publish(REVOCATION_CHANNEL, jti)
+        await pipe.execute()
+
+    async def claim(self, jti: str, expires_at: float) -> bool:
+        # Revokes jti only if nobody has yet, in one atomic SET NX. The caller
+        # that gets True owns the token, every other caller, on any worker,
+        # gets False even before the revocation message reaches its filter.
+        ttl = int(expires_at - time.time()) + 1
+        if ttl <= 0:
+            return False
+        client = RedisCache().async_client
+        if not await client.set(REVOKED_PREFIX + jti, 1, nx=True, ex=ttl):
+            return False
+        self.filter.add(jti)
+        pipe = client.pipeline()
+        pipe.zadd(REVOKED_INDEX, {jti: expires_at})
+        pipe.publish(REVOCATION_CHANNEL, jti)
+        await pipe.execute()
+        return True
+
+    async def is_revoked(self, jti: str) -> bool:
+        if jti not in self.filter:
+            return False
+        return bool(await RedisCache().async_client.exists(REVOKED_PREFIX + jti))
+
+    async def live_count(self) -> int:
+        pipe = RedisCache().async_client.pipeline()
+        pipe.zremrangebyscore(REVOKED_INDEX, "-inf", time.time())
+        pipe.zcard(REVOKED_INDEX)
+        return (await pipe.execute())[1]
+
+    async def rebuild(self) -> int:
+        # Fresh filter from the ids still live, sized so the error rate holds
+        client = RedisCache().async_client
+        await client.zremrangebyscore(REVOKED_INDEX, "-inf", time.time())
+        jtis = await client.zrange(REVOKED_INDEX, 0, -1)
+        bloom = BloomFilter(max(REVOCATION_FILTER_CAPACITY, 2 * len(jtis)), REVOCATION_FILTER_ERROR_RATE)
+        for jti in jtis:
+            bloom.add(jti)
+        self.filter = bloom
+        return len(jtis)
+
+    async def listen(self):
+        # Adds ids revoked on any worker to this worker's filter, and rebuilds it
+        # after (re)subscribing, since messages sent while away are lost, and
+        # once enough of its ids have expired
+        client = aioredis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
+        while True:
+            try:
+                pubsub = client.pubsub()
+                await pubsub.subscribe(REVOCATION_CHANNEL)
+                await self.rebuild()
+                next_check = time.monotonic() + REVOCATION_RESYNC_SECONDS
+                while True:
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+                    if message is not None and message["data"] not in self.filter:
+                        self.filter.add(message["data"])
+                    if time.monotonic() >= next_check:
+                        if len(self.filter) - await self.live_count() > REVOCATION_REBUILD_SLACK:
+                            await self.rebuild()
+                        next_check = time.monotonic() + REVOCATION_RESYNC_SECONDS
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Revocation listener error: {e}")
+                await asyncio.sleep(1)
+
+
+revocation_list = RevocationList()
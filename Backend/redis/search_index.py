@@ -0,0 +1,216 @@
+import asyncio
+import json
+from typing import List, Optional
+import redis.asyncio as aioredis
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from .redis import RedisCache
+from ..database.models import Topic, Comment
+from ..utils.structures import Trie, RadixTrie, IndexedHeap
+
+INDEX_STREAM = "index:events"     # Redis stream every API worker replays
+INDEX_SEQUENCE = "index:seq"      # last sequence number handed out
+INDEX_STREAM_MAXLEN = 100000      # approximate; a worker further behind than this rebuilds
+INDEX_READ_BATCH = 500
+INDEX_BLOCK_MS = 5000
+WARM_BATCH_SIZE = 1000
+
+SUGGEST_TOP_K = 10  # completions cached per trie node, the most suggest() can return
+FEED_CAPACITY = 1000  # entries kept per feed heap, bounding its memory
+
+# The sequence number doubles as the stream entry id ("<seq>-0"), so stream
+# order is sequence order and a worker can tell exactly which events it missed.
+PUBLISH_SCRIPT = """
+local seq
+for i = 2, #ARGV do
+    seq = redis.call('INCR', KEYS[2])
+    redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], seq .. '-0', 'event', ARGV[i])
+end
+return seq
+"""
+
+
+class IndexGap(Exception):
+    def __init__(self, last_seq: int, next_seq: int):
+        super().__init__(f"expected sequence {last_seq + 1}, got {next_seq}")
+
+
+class IndexReplicator:
+    """
+    Keeps this worker's in-memory search structures in step with every other
+    worker. Writes are published as events on a Redis stream with a global
+    sequence number and applied by every worker, the writer included, in
+    sequence order. Events carry the new state of an entity rather than a
+    delta, so replaying one that the warm-up already loaded is harmless.
+    """
+
+    def __init__(self):
+        self.topic_trie = Trie(top_k=SUGGEST_TOP_K)
+        self.comment_trie = RadixTrie()
+        # Feed heaps keep the FEED_CAPACITY best entries: newest topics keyed by
+        # id, most commented topics keyed by (comment count, id), newest comments
+        self.topic_heap = IndexedHeap(FEED_CAPACITY)
+        self.active_topic_heap = IndexedHeap(FEED_CAPACITY)
+        self.comment_heap = IndexedHeap(FEED_CAPACITY)
+        self.topics = {}            # topic id -> (title, weight) currently in topic_trie
+        self.comment_ids = set()    # comment ids currently in comment_trie
+        self.last_seq = 0
+        self.rebuilding = False
+        # Writers and catch-up run inside requests, so they use the asyncio client
+        self.redis_client = RedisCache().async_client
+        self._publish = self.redis_client.register_script(PUBLISH_SCRIPT)
+
+    # Writers
+
+    async def publish(self, events: List[dict]):
+        # Called after the database commit; applying our own events straight
+        # away gives read-your-writes without waiting for the listener
+        await self._publish(keys=[INDEX_STREAM, INDEX_SEQUENCE], args=[INDEX_STREAM_MAXLEN, *map(json.dumps, events)])
+        await self.catch_up()
+
+    async def catch_up(self):
+        if self.rebuilding:
+            return
+        try:
+            while True:
+                entries = await self.redis_client.xread({INDEX_STREAM: f"{self.last_seq}-0"}, count=INDEX_READ_BATCH)
+                if not entries or not self.apply_entries(entries[0][1]):
+                    return
+        except IndexGap:
+            pass  # the listener hits the same gap and rebuilds
+
+    # Replay
+
+    def apply_entries(self, entries) -> bool:
+        applied = False
+        for entry_id, fields in entries:
+            seq = int(entry_id.split("-")[0])
+            if seq <= self.last_seq:
+                continue  # already applied by the other reader
+            if seq != self.last_seq + 1:
+                raise IndexGap(self.last_seq, seq)
+            self.apply(json.loads(fields["event"]))
+            self.last_seq = seq
+            applied = True
+        return applied
+
+    def apply(self, event: dict):
+        handler = getattr(self, f"_apply_{event['op']}", None)
+        if handler is None:
+            print(f"Skipping unknown index event {event['op']!r}")
+            return
+        handler(event)
+
+    def _apply_topic_upsert(self, event: dict):
+        id, title, weight = event["id"], event["title"], event["weight"]
+        current = self.topics.get(id)
+        if current is None:
+            self.topic_trie.insert(title, weight)
+        elif current[0] == title:
+            self.topic_trie.increment(title, weight - current[1])
+        else:
+            self.topic_trie.remove(current[0], current[1])
+            self.topic_trie.insert(title, weight)
+        self.topics[id] = (title, weight)
+        self.topic_heap.push(id, id)
+        self.active_topic_heap.push(id, (weight, id))
+
+    def _apply_topic_delete(self, event: dict):
+        current = self.topics.pop(event["id"], None)
+        if current is not None:
+            self.topic_trie.remove(current[0], current[1])
+        self.topic_heap.remove(event["id"])
+        self.active_topic_heap.remove(event["id"])
+
+    def _apply_comment_upsert(self, event: dict):
+        id, content, old_content = event["id"], event["content"], event.get("old_content")
+        if id not in self.comment_ids:
+            self.comment_trie.insert(content)
+            self.comment_heap.push(id, id)
+            self.comment_ids.add(id)
+        elif old_content is not None and old_content != content and self.comment_trie.remove(old_content):
+            self.comment_trie.insert(content)
+
+    def _apply_comment_delete(self, event: dict):
+        if event["id"] in self.comment_ids:
+            self.comment_ids.discard(event["id"])
+            self.comment_trie.remove(event["content"])
+        self.comment_heap.remove(event["id"])
+
+    # Readers
+
+    def feed(self, kind: str, limit: int) -> List[dict]:
+        heap = self.active_topic_heap if kind == "active" else self.topic_heap
+        return [
+            {"id": id, "title": self.topics[id][0], "comment_count": self.topics[id][1]}
+            for id, _ in heap.largest(limit) if id in self.topics
+        ]
+
+    # Startup and background sync
+
+    async def rebuild(self, db: AsyncSession):
+        # Note the sequence before reading Postgres: events published while
+        # the snapshot loads are replayed afterwards and converge on it
+        self.rebuilding = True
+        try:
+            start_seq = int(await self.redis_client.get(INDEX_SEQUENCE) or 0)
+            for structure in (self.topic_trie, self.comment_trie, self.topic_heap, self.active_topic_heap, self.comment_heap):
+                structure.clear()
+            self.topics.clear()
+            self.comment_ids.clear()
+
+            rows = (await db.execute(select(Topic.id, Topic.title, Topic.comment_count))).all()
+            for id, title, weight in rows:
+                self._apply_topic_upsert({"id": id, "title": title, "weight": weight})
+
+            comments = await db.stream(
+                select(Comment.id, Comment.content).execution_options(yield_per=WARM_BATCH_SIZE)
+            )
+            async for id, content in comments:
+                self._apply_comment_upsert({"id": id, "content": content})
+            self.last_seq = start_seq
+        finally:
+            self.rebuilding = False
+        await self.catch_up()
+        print(f"Search index warmed with {len(self.topics)} topics and {len(self.comment_ids)} comments at sequence {self.last_seq}")
+
+    async def listen(self, session_factory):
+        client = aioredis.Redis(host='localhost', port=6379, db=0, decode_responses=True)
+        while True:
+            try:
+                entries = await client.xread(
+                    {INDEX_STREAM: f"{self.last_seq}-0"}, count=INDEX_READ_BATCH, block=INDEX_BLOCK_MS
+                )
+                if entries and not self.rebuilding:
+                    self.apply_entries(entries[0][1])
+                elif not entries and int(await client.get(INDEX_SEQUENCE) or 0) < self.last_seq:
+                    # The sequence went backwards, so Redis lost the stream
+                    raise IndexGap(self.last_seq, 0)
+            except asyncio.CancelledError:
+                raise
+            except IndexGap as e:
+                print(f"Search index missed events ({e}), rebuilding from Postgres")
+                async with session_factory() as db:
+                    await self.rebuild(db)
+            except Exception as e:
+                print(f"Search index listener error: {e}")
+                await asyncio.sleep(1)
+
+
+index_replicator = IndexReplicator()
+
+
+def topic_upsert(id: int, title: str, weight: int) -> dict:
+    return {"op": "topic_upsert", "id": id, "title": title, "weight": weight}
+
+
+def topic_delete(id: int) -> dict:
+    return {"op": "topic_delete", "id": id}
+
+
+def comment_upsert(id: int, content: str, old_content: Optional[str] = None) -> dict:
+    return {"op": "comment_upsert", "id": id, "content": content, "old_content": old_content}
+
+
+def comment_delete(id: int, content: str) -> dict:
+    return {"op": "comment_delete", "id": id, "content": content}
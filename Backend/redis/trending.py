@@ -0,0 +1,153 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+from sqlalchemy import func, literal_column
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from .redis import RedisCache
+from ..database.models import Topic, Comment
+
+# Comments are counted per topic in hourly buckets. A window score sums the
+# buckets it covers, each weighted by 0.5 ** (age / half_life), so activity
+# fades out smoothly instead of dropping off a cliff at the window edge. The
+# window slides: the bucket just past its start counts for the part of that
+# hour still inside it, so the 1h window does not empty out at every :00.
+WINDOWS = {
+    # name: (hours covered, half-life in hours)
+    "1h": (1, 1),
+    "24h": (24, 6),
+    "7d": (168, 48),
+}
+ALL_TIME = "all"
+BUCKET_TTL = (168 + 2) * 3600   # buckets only need to outlive the longest window
+WINDOW_CACHE_TTL = 30           # seconds a merged window set (and a trend result) is reused
+MAX_TRENDING_LIMIT = 100
+
+ALL_TIME_KEY = "trending:all"
+
+# RedisCache namespace of the hydrated trend() results
+TRENDING_CACHE_NAMESPACE = "trending_topics"
+
+
+def _bucket_key(hour: int) -> str:
+    return f"trending:bucket:{hour}"
+
+
+def _window_key(window: str) -> str:
+    return f"trending:window:{window}"
+
+
+def _current_hour(now: Optional[float] = None) -> int:
+    return int((now or time.time()) // 3600)
+
+
+class TrendingEngine:
+    """
+    Per-topic comment scores kept in Redis sorted sets and updated on every
+    write, so reading the trend is a ZREVRANGE instead of a GROUP BY.
+    """
+
+    def __init__(self):
+        # Called from request handlers, so it uses the asyncio client
+        self.redis_client = RedisCache().async_client
+
+    async def record_comment(self, topic_id: int, at: Optional[float] = None):
+        hour = _current_hour(at)
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.zincrby(_bucket_key(hour), 1, topic_id)
+        pipe.expire(_bucket_key(hour), BUCKET_TTL)
+        pipe.zincrby(ALL_TIME_KEY, 1, topic_id)
+        # Merged windows are left to expire: under steady writes, dropping them
+        # here would re-merge up to a week of buckets on nearly every read
+        return int((await pipe.execute())[2])  # the topic's new all-time comment count
+
+    async def remove_topics(self, topic_ids: List[int]):
+        if not topic_ids:
+            return
+        hour = _current_hour()
+        longest = max(hours for hours, _ in WINDOWS.values())
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.zrem(ALL_TIME_KEY, *topic_ids)
+        for age in range(longest + 1):
+            pipe.zrem(_bucket_key(hour - age), *topic_ids)
+        for window in WINDOWS:
+            pipe.zrem(_window_key(window), *topic_ids)
+        await pipe.execute()
+
+    async def top(self, window: str, limit: int) -> List[Tuple[int, float]]:
+        # ZREVRANGE 0 -1 would return the whole set
+        limit = max(1, min(limit, MAX_TRENDING_LIMIT))
+        if window == ALL_TIME:
+            key = ALL_TIME_KEY
+        else:
+            key = _window_key(window)
+            if not await self.redis_client.exists(key):
+                await self._merge_window(window)
+        return [(int(id), score) for id, score in await self.redis_client.zrevrange(key, 0, limit - 1, withscores=True)]
+
+    async def _merge_window(self, window: str):
+        hours, half_life = WINDOWS[window]
+        now = time.time()
+        hour = _current_hour(now)
+        weights = {_bucket_key(hour - age): 0.5 ** (age / half_life) for age in range(hours)}
+        elapsed = (now % 3600) / 3600   # of the current hour
+        weights[_bucket_key(hour - hours)] = (1 - elapsed) * 0.5 ** (hours / half_life)
+        pipe = self.redis_client.pipeline()
+        pipe.zunionstore(_window_key(window), weights, aggregate="SUM")
+        pipe.expire(_window_key(window), WINDOW_CACHE_TTL)
+        await pipe.execute()
+
+    async def has_scores(self) -> bool:
+        return bool(await self.redis_client.exists(ALL_TIME_KEY))
+
+    async def rebuild(self, db: AsyncSession):
+        # Reconcile the all-time scores with the topics' comment counters and
+        # the hourly buckets with the comments of the longest window, which
+        # only reads the latest partitions of the comments table
+        counts = (await db.execute(select(Topic.id, Topic.comment_count))).all()
+        hour = _current_hour()
+        longest = max(hours for hours, _ in WINDOWS.values())
+        since = datetime.utcfromtimestamp((hour - longest) * 3600)
+        # Inlined so the GROUP BY repeats the exact select expression
+        bucket_start = func.date_trunc(literal_column("'hour'"), Comment.created_at)
+        recent = (await db.execute(
+            select(bucket_start, Comment.topic_id, func.count())
+            .where(Comment.created_at >= since)
+            .group_by(bucket_start, Comment.topic_id)
+        )).all()
+        buckets = {}
+        for started, topic_id, count in recent:
+            bucket_hour = int(started.replace(tzinfo=timezone.utc).timestamp() // 3600)
+            buckets.setdefault(bucket_hour, {})[topic_id] = count
+
+        staging_key = f"{ALL_TIME_KEY}:rebuild"
+        pipe = self.redis_client.pipeline()
+        pipe.delete(staging_key)
+        if counts:
+            pipe.zadd(staging_key, {topic_id: count for topic_id, count in counts})
+            pipe.rename(staging_key, ALL_TIME_KEY)
+        else:
+            pipe.delete(ALL_TIME_KEY)
+        for age in range(longest + 1):
+            pipe.delete(_bucket_key(hour - age))
+            if hour - age in buckets:
+                pipe.zadd(_bucket_key(hour - age), buckets[hour - age])
+                pipe.expire(_bucket_key(hour - age), BUCKET_TTL)
+        for window in WINDOWS:
+            pipe.delete(_window_key(window))
+        await pipe.execute()
+        await RedisCache().ainvalidate(TRENDING_CACHE_NAMESPACE)
+        return len(counts)
+
+
+async def main():
+    from ..database.database import SessionLocal
+    async with SessionLocal() as db:
+        rebuilt = await TrendingEngine().rebuild(db)
+    print(f"Rebuilt trending scores for {rebuilt} topics")
+
+
+if __name__ == "__main__":
+    # Reconciliation job: python -m Backend.redis.trending
+    asyncio.run(main())
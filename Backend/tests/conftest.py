@@ -0,0 +1,15 @@
+import fakeredis
+import pytest
+from Backend.redis.redis import RedisCache, SET_TAGGED_SCRIPT, INVALIDATE_TAGS_SCRIPT
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    # An in-memory Redis (Lua scripts included) behind RedisCache's asyncio
+    # client. Objects that register scripts must be created after this runs.
+    cache = RedisCache()
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    monkeypatch.setattr(cache, "async_client", client)
+    monkeypatch.setattr(cache, "_aset_tagged", client.register_script(SET_TAGGED_SCRIPT))
+    monkeypatch.setattr(cache, "_ainvalidate_tags", client.register_script(INVALIDATE_TAGS_SCRIPT))
+    return client
@@ -0,0 +1,103 @@
+import asyncio
+import pytest
+from jose import jwt
+from Backend.fastapi import admission
+from Backend.fastapi.admission import (
+    AdmissionControlMiddleware, RATE_LIMIT_PREFIX, ROUTE_CLASSES, classify,
+)
+from Backend.fastapi.auth import SECRET_KEY, ALGORITHM
+
+NOW = 1_700_000_000.0
+
+
+async def ok_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b""})
+
+
+def bearer(subject: str):
+    return (b"authorization", f"Bearer {jwt.encode({'sub': subject}, SECRET_KEY, algorithm=ALGORITHM)}".encode())
+
+
+def request(middleware, path: str, ip: str = "10.0.0.1", headers=()):
+    # (status, headers) of one request through the middleware
+    scope = {"type": "http", "method": "POST", "path": path, "client": (ip, 1234), "headers": list(headers)}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(middleware(scope, receive, send))
+    start = messages[0]
+    return start["status"], {name.decode(): value.decode() for name, value in start["headers"]}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [NOW]
+    monkeypatch.setattr(admission.time, "time", lambda: now[0])
+    return now
+
+
+@pytest.fixture
+def middleware(redis_client, clock):
+    return AdmissionControlMiddleware(ok_app)
+
+
+class TestClassify:
+    def test_routes(self):
+        assert classify("/auth/token") == "login"
+        assert classify("/auth/refresh") == "token"
+        assert classify("/auth/logout") == "token"
+        assert classify("/graphql") == "graphql"
+        assert classify("/api/topics") == "default"
+
+
+class TestTokenBuckets:
+    def test_ip_burst_then_429(self, middleware):
+        login = ROUTE_CLASSES["login"]
+        allowed = login.burst * login.ip_multiplier
+        for _ in range(allowed):
+            assert request(middleware, "/auth/token")[0] == 200
+        status, headers = request(middleware, "/auth/token")
+        assert status == 429
+        # One token refills at rate * ip_multiplier per second
+        assert headers["retry-after"] == "2"
+        assert request(middleware, "/auth/token", ip="10.0.0.2")[0] == 200
+
+    def test_buckets_refill(self, middleware, clock):
+        login = ROUTE_CLASSES["login"]
+        for _ in range(login.burst * login.ip_multiplier):
+            request(middleware, "/auth/token")
+        assert request(middleware, "/auth/token")[0] == 429
+        clock[0] += 2
+        assert request(middleware, "/auth/token")[0] == 200
+
+    def test_user_bucket_refusal_does_not_drain_the_ip(self, middleware, redis_client):
+        login = ROUTE_CLASSES["login"]
+        for _ in range(login.burst):
+            assert request(middleware, "/auth/update-password", headers=[bearer("alice")])[0] == 200
+        for _ in range(3):
+            assert request(middleware, "/auth/update-password", headers=[bearer("alice")])[0] == 429
+        tokens = asyncio.run(redis_client.hget(f"{RATE_LIMIT_PREFIX}login:ip:10.0.0.1", "tokens"))
+        assert float(tokens) == login.burst * login.ip_multiplier - login.burst
+        assert request(middleware, "/auth/update-password", headers=[bearer("bob")])[0] == 200
+
+    def test_forged_token_falls_back_to_the_ip(self, middleware, redis_client):
+        forged = (b"authorization", f"Bearer {jwt.encode({'sub': 'alice'}, 'wrong', algorithm=ALGORITHM)}".encode())
+        assert request(middleware, "/graphql", headers=[forged])[0] == 200
+        assert not asyncio.run(redis_client.exists(f"{RATE_LIMIT_PREFIX}graphql:user:alice"))
+
+    def test_route_bucket_is_shared_across_ips(self, middleware, monkeypatch):
+        monkeypatch.setitem(ROUTE_CLASSES, "token", ROUTE_CLASSES["token"]._replace(route_rate=3))
+        statuses = [request(middleware, "/auth/refresh", ip=f"10.0.1.{i}")[0] for i in range(4)]
+        assert statuses == [200, 200, 200, 429]
+
+    def test_fails_open_without_redis(self, middleware, monkeypatch):
+        async def down(*args, **kwargs):
+            raise ConnectionError("connection refused")
+        monkeypatch.setattr(middleware, "_take", down)
+        assert request(middleware, "/auth/token")[0] == 200
@@ -0,0 +1,26 @@
+import pytest
+from Backend.utils.structures import BloomFilter
+
+
+class TestBloomFilter:
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(1000, 0.01)
+        items = [f"jti-{i}" for i in range(1000)]
+        for item in items:
+            bloom.add(item)
+        assert all(item in bloom for item in items)
+        assert len(bloom) == 1000
+
+    def test_false_positive_rate_near_target(self):
+        bloom = BloomFilter(1000, 0.01)
+        for i in range(1000):
+            bloom.add(f"in-{i}")
+        false_positives = sum(f"out-{i}" in bloom for i in range(10000))
+        assert false_positives < 300   # 1% expected, generous bound
+
+    @pytest.mark.parametrize("capacity", [1, 7, 100])
+    def test_small_filters(self, capacity):
+        bloom = BloomFilter(capacity, 0.001)
+        assert "anything" not in bloom
+        bloom.add("anything")
+        assert "anything" in bloom
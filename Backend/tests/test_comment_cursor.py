@@ -0,0 +1,25 @@
+import base64
+import pytest
+from Backend.graphql.graphql_schema import encode_comment_cursor, decode_comment_cursor
+
+
+def b64(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode()).decode()
+
+
+class TestCommentCursor:
+    @pytest.mark.parametrize("id", [1, 123456789])
+    def test_round_trip(self, id):
+        assert decode_comment_cursor(encode_comment_cursor(id)) == id
+
+    @pytest.mark.parametrize("cursor", [
+        "not base64!",
+        b64("topic:5"),
+        b64("comment:x"),
+        b64("comment:1:2"),
+        b64("comment"),
+        base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    ])
+    def test_invalid(self, cursor):
+        with pytest.raises(ValueError, match="Invalid cursor"):
+            decode_comment_cursor(cursor)
@@ -0,0 +1,91 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+import pytest
+from Backend.redis import inbox as inbox_module
+from Backend.redis.inbox import NotificationInbox
+
+USER = 7
+
+
+def notification(id: int):
+    return SimpleNamespace(id=id, user_id=USER, created_at=datetime(2026, 10, 18, 12, 0, id))
+
+
+def recent(*ids):
+    return [(id, notification(id).created_at) for id in ids]
+
+
+@pytest.fixture
+def inbox(redis_client):
+    return NotificationInbox()
+
+
+async def rebuilt(inbox: NotificationInbox, unread: int, *ids):
+    # Rebuild the way get_inbox_state does, without racing anything
+    return await inbox.rebuild(USER, unread, recent(*ids), await inbox.version(USER))
+
+
+class TestNotificationInbox:
+    def test_add_ignores_a_missing_inbox(self, inbox):
+        async def run():
+            await inbox.add_many([notification(1)])
+            return await inbox.unread_count(USER), await inbox.latest_id(USER)
+        assert asyncio.run(run()) == (None, None)
+
+    def test_add_counts_and_caps_recent_ids(self, inbox, monkeypatch):
+        monkeypatch.setattr(inbox_module, "INBOX_SIZE", 3)
+
+        async def run():
+            assert await rebuilt(inbox, 1, 1)
+            await inbox.add_many([notification(id) for id in range(2, 6)])
+            recent_key = inbox._keys(USER)[0]
+            return await inbox.unread_count(USER), await inbox.latest_id(USER), await inbox.redis_client.zrange(recent_key, 0, -1)
+        assert asyncio.run(run()) == (5, 5, ["3", "4", "5"])
+
+    def test_mark_read_decrements(self, inbox):
+        async def run():
+            await rebuilt(inbox, 3, 1, 2, 3)
+            await inbox.mark_read(USER, 2)
+            return await inbox.unread_count(USER)
+        assert asyncio.run(run()) == 1
+
+    def test_mark_read_below_zero_drops_the_counter(self, inbox):
+        async def run():
+            await rebuilt(inbox, 1, 1)
+            await inbox.mark_read(USER, 2)
+            return await inbox.unread_count(USER)
+        assert asyncio.run(run()) is None
+
+    def test_add_after_mark_all_leaves_no_phantom_count(self, inbox):
+        # The consumer committed notification 2, mark-all marked it read in
+        # Postgres, and only then does add_many run
+        async def run():
+            await rebuilt(inbox, 1, 1)
+            await inbox.mark_all_read(USER)
+            await inbox.add_many([notification(2)])
+            return await inbox.unread_count(USER)
+        assert asyncio.run(run()) is None
+
+    @pytest.mark.parametrize("change", [
+        lambda inbox: inbox.add_many([notification(2)]),
+        lambda inbox: inbox.mark_read(USER, 1),
+        lambda inbox: inbox.mark_all_read(USER),
+    ])
+    def test_rebuild_loses_to_a_concurrent_change(self, inbox, change):
+        async def run():
+            await rebuilt(inbox, 1, 1)
+            version = await inbox.version(USER)
+            await change(inbox)
+            written = await inbox.rebuild(USER, 0, [], version)
+            return written, await inbox.latest_id(USER)
+        written, latest_id = asyncio.run(run())
+        assert not written
+        assert latest_id is not None
+
+    def test_rebuild_on_a_missing_inbox(self, inbox):
+        # A missing version key reads as "0" on both sides of the check
+        async def run():
+            assert await rebuilt(inbox, 0)
+            return await inbox.unread_count(USER), await inbox.latest_id(USER)
+        assert asyncio.run(run()) == (0, None)
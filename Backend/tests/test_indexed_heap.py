@@ -0,0 +1,71 @@
+import random
+from Backend.utils.structures import IndexedHeap
+
+
+def assert_heap_invariants(heap: IndexedHeap):
+    # Every parent is <= its children and the index points at each entry
+    for i, entry in enumerate(heap.heap):
+        for child in (2 * i + 1, 2 * i + 2):
+            if child < len(heap.heap):
+                assert entry <= heap.heap[child]
+        assert heap.position[entry[1]] == i
+    assert len(heap.position) == len(heap.heap)
+
+
+class TestIndexedHeap:
+    def test_pop_returns_keys_in_order(self):
+        heap = IndexedHeap()
+        keys = random.Random(1).sample(range(1000), 200)
+        for id, key in enumerate(keys):
+            heap.push(id, key)
+        assert_heap_invariants(heap)
+        assert [heap.pop()[1] for _ in range(len(keys))] == sorted(keys)
+
+    def test_update_moves_entry_both_ways(self):
+        heap = IndexedHeap()
+        for id in range(50):
+            heap.push(id, id)
+        heap.update(40, -1)
+        assert_heap_invariants(heap)
+        assert heap.pop() == (40, -1)
+        heap.update(0, 100)
+        assert_heap_invariants(heap)
+        assert heap.largest(1) == [(0, 100)]
+
+    def test_push_existing_id_rekeys_it(self):
+        heap = IndexedHeap()
+        heap.push(1, 5)
+        heap.push(1, 7)
+        assert len(heap) == 1
+        assert heap.largest(1) == [(1, 7)]
+
+    def test_remove(self):
+        rng = random.Random(2)
+        heap = IndexedHeap()
+        for id in range(100):
+            heap.push(id, rng.random())
+        for id in rng.sample(range(100), 60):
+            assert heap.remove(id)
+            assert id not in heap
+            assert_heap_invariants(heap)
+        assert len(heap) == 40
+        assert not heap.remove(-1)
+
+    def test_capacity_keeps_largest_keys(self):
+        heap = IndexedHeap(capacity=10)
+        keys = random.Random(3).sample(range(1000), 100)
+        for id, key in enumerate(keys):
+            heap.push(id, key)
+            assert len(heap) <= 10
+            assert_heap_invariants(heap)
+        assert [key for _, key in heap.largest(10)] == sorted(keys, reverse=True)[:10]
+
+    def test_capacity_drops_smaller_entry(self):
+        heap = IndexedHeap(capacity=2)
+        heap.push(1, 10)
+        heap.push(2, 20)
+        assert not heap.push(3, 5)
+        assert 3 not in heap
+        assert heap.push(4, 30)
+        assert 1 not in heap
+        assert_heap_invariants(heap)
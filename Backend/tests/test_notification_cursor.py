@@ -0,0 +1,30 @@
+import base64
+from datetime import datetime
+import pytest
+from fastapi import HTTPException
+from Backend.fastapi.operations import encode_cursor, decode_cursor
+
+
+def b64(text: str) -> str:
+    return base64.urlsafe_b64encode(text.encode()).decode()
+
+
+class TestNotificationCursor:
+    @pytest.mark.parametrize("created_at", [
+        datetime(2026, 10, 18, 12, 30, 5, 123456),
+        datetime(2026, 1, 1),
+    ])
+    def test_round_trip(self, created_at):
+        assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+    @pytest.mark.parametrize("cursor", [
+        "not base64!",
+        b64("no separator"),
+        b64("2026-10-18T12:00:00|not-an-id"),
+        b64("yesterday|5"),
+        b64("2026-10-18T12:00:00|5|6"),
+    ])
+    def test_invalid(self, cursor):
+        with pytest.raises(HTTPException) as error:
+            decode_cursor(cursor)
+        assert error.value.status_code == 400
@@ -0,0 +1,98 @@
+from typing import List
+import pytest
+import strawberry
+from graphql import parse
+from graphql.utilities import get_operation_ast
+from Backend.graphql.extensions import DEFAULT_LIST_SIZE, QueryCostLimiter, selection_cost
+
+resolved = []
+
+
+@strawberry.type
+class Item:
+    id: int
+    name: str
+
+
+@strawberry.type
+class Page:
+    items: List[Item]
+
+
+@strawberry.type
+class Query:
+    @strawberry.field
+    def item(self) -> Item:
+        resolved.append("item")
+        return Item(id=1, name="one")
+
+    @strawberry.field
+    def items(self) -> List[Item]:
+        resolved.append("items")
+        return [Item(id=1, name="one")]
+
+    @strawberry.field
+    def limited(self, limit: int) -> List[Item]:
+        return [Item(id=i, name=str(i)) for i in range(limit)]
+
+    @strawberry.field
+    def page(self, first: int) -> Page:
+        return Page(items=[])
+
+
+plain_schema = strawberry.Schema(query=Query)
+
+
+def cost(query: str, variables=None) -> int:
+    document = parse(query)
+    operation = get_operation_ast(document)
+    fragments = {
+        definition.name.value: definition
+        for definition in document.definitions if definition.kind == "fragment_definition"
+    }
+    root_type = plain_schema._schema.query_type
+    return selection_cost(root_type, operation.selection_set, fragments, variables or {})
+
+
+class TestSelectionCost:
+    def test_fields_cost_one_each(self):
+        assert cost("{ item { id name } }") == 3
+
+    def test_unsized_list_assumes_default_size(self):
+        assert cost("{ items { id name } }") == 1 + DEFAULT_LIST_SIZE * 2
+
+    def test_size_argument_multiplies(self):
+        assert cost("{ limited(limit: 50) { id } }") == 1 + 50
+        assert cost("query ($n: Int!) { limited(limit: $n) { id } }", {"n": 3}) == 1 + 3
+        assert cost("{ limited(limit: 0) { id } }") == 1 + 1
+
+    def test_connection_size_covers_its_list(self):
+        # page(first) sizes the items list below it, so items is not multiplied again
+        assert cost("{ page(first: 5) { items { id } } }") == 1 + 5 * (1 + 1)
+
+    def test_fragments_and_introspection(self):
+        query = "{ ...parts __typename } fragment parts on Query { item { ... on Item { id } } }"
+        assert cost(query) == 2
+
+
+class TestQueryCostLimiter:
+    @pytest.fixture
+    def schema(self):
+        resolved.clear()
+        return strawberry.Schema(query=Query, extensions=[QueryCostLimiter(max_cost=DEFAULT_LIST_SIZE)])
+
+    def test_allows_a_cheap_query(self, schema):
+        result = schema.execute_sync("{ item { id } }")
+        assert result.errors is None
+        assert result.data == {"item": {"id": 1}}
+
+    def test_rejects_before_resolving(self, schema):
+        result = schema.execute_sync("{ items { id } }")
+        assert result.data is None
+        assert "exceeds the maximum" in result.errors[0].message
+        assert resolved == []
+
+    def test_prices_variables(self, schema):
+        query = "query ($n: Int!) { limited(limit: $n) { id } }"
+        assert schema.execute_sync(query, variable_values={"n": 2}).errors is None
+        assert schema.execute_sync(query, variable_values={"n": 20}).errors
@@ -0,0 +1,94 @@
+import random
+from Backend.utils.structures import RadixTrie
+
+
+def radix_words(node, prefix=""):
+    # {word: count} of everything stored below node
+    words = {}
+    if node.count:
+        words[prefix + node.label] = node.count
+    for child in (node.children or {}).values():
+        words.update(radix_words(child, prefix + node.label))
+    return words
+
+
+def assert_compressed(trie: RadixTrie):
+    # Below the root no node is an empty-label node, and a node that holds no
+    # word has at least two children (otherwise it should have been merged)
+    stack = list((trie.root.children or {}).values())
+    while stack:
+        node = stack.pop()
+        assert node.label
+        if node.count == 0:
+            assert node.children and len(node.children) >= 2
+        for first, child in (node.children or {}).items():
+            assert child.label[0] == first
+            stack.append(child)
+
+
+class TestRadixTrie:
+    def test_insert_splits_shared_prefix(self):
+        trie = RadixTrie()
+        trie.insert("romane")
+        trie.insert("romanus")
+        trie.insert("rom")
+        (node,) = trie.root.children.values()
+        assert node.label == "rom"
+        assert node.count == 1
+        (middle,) = node.children.values()
+        assert middle.label == "an"
+        assert sorted(child.label for child in middle.children.values()) == ["e", "us"]
+        assert radix_words(trie.root) == {"romane": 1, "romanus": 1, "rom": 1}
+        assert trie.search("rom") and not trie.search("roma")
+
+    def test_remove_recompresses(self):
+        trie = RadixTrie()
+        for word in ("romane", "romanus", "romulus"):
+            trie.insert(word)
+        assert trie.remove("romanus")
+        assert_compressed(trie)
+        assert radix_words(trie.root) == {"romane": 1, "romulus": 1}
+        # "rom" now has children "ane" and "ulus"
+        (node,) = trie.root.children.values()
+        assert node.label == "rom"
+        assert sorted(child.label for child in node.children.values()) == ["ane", "ulus"]
+
+    def test_remove_inner_word_merges_single_child(self):
+        trie = RadixTrie()
+        trie.insert("test")
+        trie.insert("testing")
+        assert trie.remove("test")
+        assert_compressed(trie)
+        (node,) = trie.root.children.values()
+        assert node.label == "testing"
+        assert not trie.search("test") and trie.search("testing")
+
+    def test_counts_and_missing_words(self):
+        trie = RadixTrie()
+        trie.insert("same")
+        trie.insert("same")
+        assert trie.remove("same")
+        assert trie.search("same")
+        assert trie.remove("same")
+        assert not trie.search("same")
+        assert not trie.remove("same")
+        assert not trie.remove("sam")
+        assert trie.root.children is None
+
+    def test_random_operations_match_a_counter(self):
+        rng = random.Random(4)
+        vocabulary = ["".join(rng.choice("ab") for _ in range(rng.randint(1, 6))) for _ in range(40)]
+        trie, expected = RadixTrie(), {}
+        for _ in range(2000):
+            word = rng.choice(vocabulary)
+            if rng.random() < 0.6:
+                trie.insert(word)
+                expected[word] = expected.get(word, 0) + 1
+            else:
+                assert trie.remove(word) == (expected.get(word, 0) > 0)
+                if expected.get(word):
+                    expected[word] -= 1
+                    if not expected[word]:
+                        del expected[word]
+            assert_compressed(trie)
+        assert radix_words(trie.root) == expected
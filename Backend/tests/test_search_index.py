@@ -0,0 +1,83 @@
+import asyncio
+import pytest
+from Backend.redis.search_index import (
+    INDEX_STREAM, INDEX_SEQUENCE, IndexGap, IndexReplicator,
+    topic_upsert, topic_delete, comment_upsert, comment_delete,
+)
+
+
+@pytest.fixture
+def replicas(redis_client):
+    # Two API workers sharing one Redis
+    return IndexReplicator(), IndexReplicator()
+
+
+class TestIndexReplicator:
+    def test_publish_numbers_events_in_stream_order(self, replicas, redis_client):
+        writer, _ = replicas
+
+        async def run():
+            await writer.publish([topic_upsert(1, "redis", 0), topic_upsert(2, "rust", 0)])
+            await writer.publish([comment_upsert(1, "hello")])
+            entries = await redis_client.xrange(INDEX_STREAM)
+            return [entry_id for entry_id, _ in entries], await redis_client.get(INDEX_SEQUENCE)
+        assert asyncio.run(run()) == (["1-0", "2-0", "3-0"], "3")
+
+    def test_writer_reads_its_own_writes(self, replicas):
+        writer, _ = replicas
+        asyncio.run(writer.publish([topic_upsert(1, "redis", 4), comment_upsert(1, "hello")]))
+        assert writer.last_seq == 2
+        assert writer.topic_trie.suggest("re") == ["redis"]
+        assert writer.comment_trie.search("hello")
+
+    def test_replicas_converge(self, replicas):
+        writer, reader = replicas
+
+        async def run():
+            await writer.publish([topic_upsert(1, "redis", 1), topic_upsert(2, "rust", 5)])
+            await writer.publish([topic_upsert(1, "redis streams", 9), comment_upsert(1, "hi")])
+            await writer.publish([comment_upsert(1, "hello", old_content="hi"), topic_delete(2)])
+            await writer.publish([comment_upsert(2, "bye"), comment_delete(2, "bye")])
+            await reader.catch_up()
+        asyncio.run(run())
+        for replica in replicas:
+            assert replica.last_seq == 8
+            assert replica.topic_trie.suggest("r") == ["redis streams"]
+            assert not replica.topic_trie.search("redis")
+            assert replica.feed("active", 10) == [{"id": 1, "title": "redis streams", "comment_count": 9}]
+            assert replica.comment_trie.search("hello") and not replica.comment_trie.search("hi")
+            assert replica.comment_ids == {1}
+
+    def test_replay_skips_applied_events(self, replicas, redis_client):
+        writer, _ = replicas
+
+        async def run():
+            await writer.publish([topic_upsert(1, "redis", 1)])
+            entries = await redis_client.xrange(INDEX_STREAM)
+            return writer.apply_entries(entries)
+        assert not asyncio.run(run())
+        assert writer.topic_trie.suggest("r") == ["redis"]
+
+    def test_missing_event_is_a_gap(self, replicas, redis_client):
+        writer, reader = replicas
+
+        async def run():
+            await writer.publish([topic_upsert(1, "redis", 0), topic_upsert(2, "rust", 0)])
+            await redis_client.xdel(INDEX_STREAM, "1-0")
+            await reader.catch_up()  # leaves the gap to the listener's rebuild
+            assert reader.last_seq == 0
+            return await redis_client.xrange(INDEX_STREAM)
+        entries = asyncio.run(run())
+        with pytest.raises(IndexGap):
+            reader.apply_entries(entries)
+        assert reader.topics == {}
+
+    def test_catch_up_waits_for_a_rebuild(self, replicas):
+        writer, reader = replicas
+        reader.rebuilding = True
+
+        async def run():
+            await writer.publish([topic_upsert(1, "redis", 0)])
+            await reader.catch_up()
+        asyncio.run(run())
+        assert reader.last_seq == 0
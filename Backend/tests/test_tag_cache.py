@@ -0,0 +1,109 @@
+import asyncio
+from typing import List
+import pytest
+import strawberry
+from redis.exceptions import RedisError
+from Backend.graphql.extensions import CacheField
+from Backend.redis.redis import RedisCache
+
+calls = []
+
+
+@strawberry.type
+class Item:
+    id: int
+    name: str
+
+
+items = {1: "one", 2: "two"}
+
+
+def get_items(ids: List[int]) -> List[Item]:
+    calls.append(ids)
+    return [Item(id=id, name=items[id]) for id in ids if id in items]
+
+
+@strawberry.type
+class Query:
+    items: List[Item] = strawberry.field(resolver=get_items, extensions=[
+        CacheField(lambda result, _: [f"item:{item.id}" for item in result]),
+    ])
+
+
+schema = strawberry.Schema(query=Query)
+QUERY = "query ($ids: [Int!]!) { items(ids: $ids) { id name } }"
+
+
+def names(ids):
+    result = asyncio.run(schema.execute(QUERY, variable_values={"ids": ids}))
+    assert result.errors is None
+    return [item["name"] for item in result.data["items"]]
+
+
+class TestTaggedEntries:
+    def test_invalidate_drops_tagged_entries(self, redis_client):
+        cache = RedisCache()
+
+        async def run():
+            epoch = await cache.atag_epoch()
+            assert await cache.aset_tagged("a", 1, ["topic:1"], epoch)
+            assert await cache.aset_tagged("b", 2, ["topic:1", "user:7"], epoch)
+            assert await cache.aset_tagged("c", 3, ["user:8"], epoch)
+            await cache.ainvalidate_tags("topic:1")
+            return [await cache.aget(key) for key in "abc"], await redis_client.exists("tag:topic:1")
+        assert asyncio.run(run()) == ([None, None, 3], 0)
+
+    def test_stale_epoch_is_refused(self, redis_client):
+        cache = RedisCache()
+
+        async def run():
+            epoch = await cache.atag_epoch()
+            await cache.ainvalidate_tags("topic:1")  # a write lands while the value is computed
+            stored = await cache.aset_tagged("a", 1, ["topic:1"], epoch)
+            return stored, await cache.aget("a")
+        assert asyncio.run(run()) == (False, None)
+
+    def test_tag_sets_outlive_their_entries(self, redis_client):
+        cache = RedisCache()
+
+        async def run():
+            epoch = await cache.atag_epoch()
+            await cache.aset_tagged("a", 1, ["topic:1"], epoch, expire=600)
+            await cache.aset_tagged("b", 2, ["topic:1"], epoch, expire=60)
+            return await redis_client.ttl("tag:topic:1")
+        assert asyncio.run(run()) > 60
+
+
+class TestCacheField:
+    @pytest.fixture(autouse=True)
+    def reset(self, redis_client):
+        calls.clear()
+        items.update({1: "one", 2: "two"})
+
+    def test_serves_from_cache_until_invalidated(self):
+        assert names([1, 2]) == ["one", "two"]
+        items[2] = "deux"
+        assert names([1, 2]) == ["one", "two"]
+        asyncio.run(RedisCache().ainvalidate_tags("item:2"))
+        assert names([1, 2]) == ["one", "deux"]
+        assert calls == [[1, 2], [1, 2]]
+
+    def test_arguments_are_cached_separately(self):
+        names([1])
+        names([2])
+        asyncio.run(RedisCache().ainvalidate_tags("item:1"))
+        names([2])
+        assert calls == [[1], [2]]
+
+    def test_empty_results_are_not_cached(self):
+        assert names([3]) == []
+        items[3] = "three"
+        assert names([3]) == ["three"]
+
+    def test_serves_uncached_without_redis(self, monkeypatch):
+        async def down(*args, **kwargs):
+            raise RedisError("connection refused")
+        monkeypatch.setattr(RedisCache(), "aget", down)
+        assert names([1]) == ["one"]
+        assert names([1]) == ["one"]
+        assert len(calls) == 2
@@ -0,0 +1,94 @@
+import random
+import pytest
+from Backend.utils.structures import Trie
+
+
+def expected(weights: dict, prefix: str, k: int):
+    # Weights of the k most popular stored words under prefix, by brute force
+    matches = sorted((w for word, w in weights.items() if word.startswith(prefix)), reverse=True)
+    return matches[:k]
+
+
+def assert_suggestions(trie: Trie, weights: dict, k: int):
+    prefixes = {word[:i] for word in weights for i in range(len(word) + 1)}
+    for prefix in prefixes:
+        suggested = trie.suggest(prefix)
+        assert len(set(suggested)) == len(suggested)
+        assert all(word.startswith(prefix) for word in suggested)
+        assert [weights[word] for word in suggested] == expected(weights, prefix, k)
+
+
+class TestTrie:
+    def test_suggest_ranks_by_weight(self):
+        trie = Trie()
+        for word, weight in [("car", 5), ("cart", 9), ("care", 1), ("cat", 7), ("dog", 3)]:
+            trie.insert(word, weight)
+        assert trie.suggest("ca") == ["cart", "cat", "car", "care"]
+        assert trie.suggest("car", k=2) == ["cart", "car"]
+        assert trie.suggest("x") == []
+
+    def test_suggest_is_capped_at_top_k(self):
+        trie = Trie(top_k=3)
+        for weight, word in enumerate(["a", "ab", "abc", "abd", "abe"]):
+            trie.insert(word, weight)
+        assert trie.suggest("a") == ["abe", "abd", "abc"]
+        assert trie.suggest("a", k=10) == ["abe", "abd", "abc"]
+
+    def test_increment_reranks(self):
+        trie = Trie()
+        trie.insert("car", 5)
+        trie.insert("cat", 7)
+        assert trie.increment("car", 3)
+        assert trie.suggest("ca") == ["car", "cat"]
+        assert not trie.increment("ca")
+        assert not trie.increment("bus")
+
+    def test_decrement_lets_an_uncached_word_back_in(self):
+        trie = Trie(top_k=2)
+        for word, weight in [("aa", 10), ("ab", 9), ("ac", 8)]:
+            trie.insert(word, weight)
+        assert trie.suggest("a") == ["aa", "ab"]
+        trie.increment("aa", -5)
+        assert trie.suggest("a") == ["ab", "ac"]
+
+    def test_remove_prunes_and_refreshes(self):
+        trie = Trie(top_k=2)
+        for word, weight in [("ten", 3), ("tent", 9), ("test", 5)]:
+            trie.insert(word, weight)
+        assert trie.remove("tent", 9)
+        assert not trie.search("tent")
+        assert "t" not in trie.root.children["t"].children["e"].children["n"].children
+        assert trie.suggest("te") == ["test", "ten"]
+        assert not trie.remove("tent")
+
+    def test_remove_keeps_repeated_words(self):
+        trie = Trie()
+        trie.insert("go", 2)
+        trie.insert("go", 3)
+        assert trie.remove("go", 3)
+        assert trie.search("go")
+        assert trie.suggest("g") == ["go"]
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_random_operations_match_brute_force(self, seed):
+        rng = random.Random(seed)
+        k = 4
+        trie = Trie(top_k=k)
+        weights = {}
+        for _ in range(300):
+            word = "".join(rng.choice("abc") for _ in range(rng.randint(1, 4)))
+            op = rng.random()
+            if word not in weights or op < 0.4:
+                # Distinct weights keep the expected order unambiguous
+                weight = rng.random()
+                if word in weights:
+                    trie.remove(word, weights.pop(word))
+                trie.insert(word, weight)
+                weights[word] = weight
+            elif op < 0.7:
+                delta = rng.uniform(-1, 1)
+                assert trie.increment(word, delta)
+                weights[word] += delta
+            else:
+                assert trie.remove(word, weights.pop(word))
+            assert_suggestions(trie, weights, k)
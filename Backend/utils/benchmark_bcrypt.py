@@ -0,0 +1,58 @@
+import argparse
+import asyncio
+import time
+from passlib.context import CryptContext
+from ..fastapi.passwords import PasswordHasher, BCRYPT_ROUNDS, HASH_WORKERS
+
+# Run with: python -m Backend.utils.benchmark_bcrypt --target-ms 250
+# Times one bcrypt hash per cost factor to choose BCRYPT_ROUNDS, then measures
+# how many logins per second the PasswordHasher pool sustains at that cost.
+
+
+def time_hash(rounds: int, samples: int) -> float:
+    context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=rounds)
+    context.hash("warm up")
+    started = time.perf_counter()
+    for _ in range(samples):
+        context.hash("correct horse battery staple")
+    return (time.perf_counter() - started) / samples
+
+
+async def pool_throughput(workers: int, jobs: int) -> float:
+    hasher = PasswordHasher(workers=workers, queue_limit=jobs)
+    hashed = await hasher.hash("correct horse battery staple")
+    # Workers are spawned on demand, keep their startup out of the measurement
+    await asyncio.gather(*(hasher.verify("correct horse battery staple", hashed) for _ in range(workers)))
+    started = time.perf_counter()
+    await asyncio.gather(*(hasher.verify("correct horse battery staple", hashed) for _ in range(jobs)))
+    elapsed = time.perf_counter() - started
+    hasher.stop()
+    return jobs / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="bcrypt cost and password pool throughput benchmark")
+    parser.add_argument("--min-rounds", type=int, default=10)
+    parser.add_argument("--max-rounds", type=int, default=14)
+    parser.add_argument("--samples", type=int, default=3)
+    parser.add_argument("--target-ms", type=float, default=250)
+    parser.add_argument("--workers", type=int, default=HASH_WORKERS)
+    parser.add_argument("--jobs", type=int, default=64)
+    args = parser.parse_args()
+
+    print(f"{'rounds':>6} {'ms/hash':>8}")
+    chosen = args.min_rounds
+    for rounds in range(args.min_rounds, args.max_rounds + 1):
+        milliseconds = time_hash(rounds, args.samples) * 1000
+        print(f"{rounds:>6} {milliseconds:>8.1f}")
+        if milliseconds <= args.target_ms:
+            chosen = rounds
+    print(f"Highest cost within {args.target_ms:.0f} ms: BCRYPT_ROUNDS={chosen} (configured: {BCRYPT_ROUNDS})")
+
+    # Verifications run at the configured cost, the pool imports BCRYPT_ROUNDS itself
+    rate = asyncio.run(pool_throughput(args.workers, args.jobs))
+    print(f"{args.workers} workers: {rate:.1f} verifications/s at BCRYPT_ROUNDS={BCRYPT_ROUNDS}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from .structures import Trie, RadixTrie
+
+# Run with: python -m Backend.utils.benchmark_trie --comments 5000
+# Compares the compressed RadixTrie with the per-character tries on synthetic
+# comment bodies, which is what comment_trie stores: the plain trie
+# comment_trie used before (BaselineTrie below) and today's structures.Trie,
+# which also keeps a top-k completion list on every node for autocomplete.
+
+VOCABULARY_SIZE = 5000
+
+
+class BaselineTrieNode:
+    def __init__(self):
+        self.children = {}
+        self.is_end_of_word = False
+
+
+class BaselineTrie:
+    # structures.Trie as it was before the top-k autocomplete index
+    def __init__(self):
+        self.root = BaselineTrieNode()
+
+    def insert(self, word):
+        node = self.root
+        for char in word:
+            if char not in node.children:
+                node.children[char] = BaselineTrieNode()
+            node = node.children[char]
+        node.is_end_of_word = True
+
+    def search(self, word):
+        node = self.root
+        for char in word:
+            if char not in node.children:
+                return False
+            node = node.children[char]
+        return node.is_end_of_word
+
+
+STRUCTURES = (
+    ("Trie (baseline)", BaselineTrie),
+    ("Trie (top-k)", Trie),
+    ("RadixTrie", RadixTrie),
+)
+
+
+def make_comments(count: int, seed: int):
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(rng.randint(2, 10)))
+                  for _ in range(VOCABULARY_SIZE)]
+    # Comments often open the same way ("thanks for", "I think"), the rest is free text
+    openers = [" ".join(rng.choices(vocabulary, k=rng.randint(1, 3))) for _ in range(50)]
+    return [
+        f"{rng.choice(openers)} {' '.join(rng.choices(vocabulary, k=rng.randint(5, 60)))}"
+        for _ in range(count)
+    ]
+
+
+def measure(factory, comments, lookups):
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    trie = factory()
+    for comment in comments:
+        trie.insert(comment)
+    insert_seconds = time.perf_counter() - started
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    started = time.perf_counter()
+    found = sum(trie.search(word) for word in lookups)
+    lookup_seconds = time.perf_counter() - started
+    return memory, insert_seconds, lookup_seconds, found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory and lookup benchmark for the per-character tries vs RadixTrie")
+    parser.add_argument("--comments", type=int, default=5000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    comments = make_comments(args.comments, args.seed)
+    rng = random.Random(args.seed)
+    # Half hits, half near misses that share a long prefix with a stored comment
+    lookups = [rng.choice(comments) for _ in range(args.lookups // 2)]
+    lookups += [rng.choice(comments)[:-1] + "!" for _ in range(args.lookups - len(lookups))]
+    text_bytes = sum(len(comment) for comment in comments)
+
+    print(f"{args.comments} comments, {text_bytes / 2**20:.1f} MiB of text, {len(lookups)} lookups")
+    print(f"{'structure':<16} {'memory MiB':>11} {'insert s':>9} {'lookup us':>10} {'hits':>7}")
+    for name, factory in STRUCTURES:
+        memory, insert_seconds, lookup_seconds, found = measure(factory, comments, lookups)
+        print(f"{name:<16} {memory / 2**20:>11.1f} {insert_seconds:>9.2f} "
+              f"{lookup_seconds / len(lookups) * 1e6:>10.2f} {found:>7}")
+
+
+if __name__ == "__main__":
+    main()
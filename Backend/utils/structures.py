@@ -2,18 +2,64 @@ class TrieNode:
     def __init__(self):
         self.children = {}
         self.is_end_of_word = False
+        self.count = 0      # number of times the word ending here was inserted
+        self.weight = 0     # popularity of the word ending here
+        self.top = []       # cached [(word, weight)] best completions below this node
 
 class Trie:
-    def __init__(self):
+    def __init__(self, top_k=10):
         self.root = TrieNode()
+        self.top_k = top_k
 
-    def insert(self, word):
+    def clear(self):
+        self.root = TrieNode()
+
+    def insert(self, word, weight=0):
+        path = [self.root]
         node = self.root
         for char in word:
             if char not in node.children:
                 node.children[char] = TrieNode()
             node = node.children[char]
+            path.append(node)
         node.is_end_of_word = True
+        node.count += 1
+        node.weight += weight
+        self._promote(path, word, node.weight)
+
+    def increment(self, word, delta=1):
+        # Adjust the popularity of a word that is already stored
+        path = self._path(word)
+        if path is None or not path[-1].is_end_of_word:
+            return False
+        node = path[-1]
+        node.weight += delta
+        if delta >= 0:
+            self._promote(path, word, node.weight)
+        else:
+            self._refresh(path, word)
+        return True
+
+    def remove(self, word, weight=0):
+        path = self._path(word)
+        if path is None or not path[-1].is_end_of_word:
+            return False
+        node = path[-1]
+        node.count -= 1
+        node.weight -= weight
+        if node.count <= 0:
+            node.is_end_of_word = False
+            node.count = 0
+            node.weight = 0
+            # Prune the branch that only existed for this word
+            for depth in range(len(word), 0, -1):
+                child = path[depth]
+                if child.children or child.is_end_of_word:
+                    break
+                del path[depth - 1].children[word[depth - 1]]
+                path.pop()
+        self._refresh(path, word)
+        return True
 
     def search(self, word):
         node = self.root
@@ -23,6 +69,142 @@ class Trie:
             node = node.children[char]
         return node.is_end_of_word
 
+    def suggest(self, prefix, k=None):
+        # Most popular stored words starting with prefix, read from the node cache
+        path = self._path(prefix)
+        if path is None:
+            return []
+        k = self.top_k if k is None else min(k, self.top_k)
+        return [word for word, _ in path[-1].top[:k]]
+
+    def _path(self, word):
+        path = [self.root]
+        node = self.root
+        for char in word:
+            node = node.children.get(char)
+            if node is None:
+                return None
+            path.append(node)
+        return path
+
+    def _promote(self, path, word, weight):
+        # A word only gained weight, so caches along its path just need it re-ranked in
+        for node in path:
+            top = [entry for entry in node.top if entry[0] != word]
+            top.append((word, weight))
+            top.sort(key=lambda entry: -entry[1])
+            node.top = top[:self.top_k]
+
+    def _refresh(self, path, word):
+        # A word lost weight or was removed, so a completion outside the cache may
+        # now qualify: rebuild the caches bottom-up from each node's children
+        for depth in range(len(path) - 1, -1, -1):
+            node = path[depth]
+            candidates = [entry for child in node.children.values() for entry in child.top]
+            if node.is_end_of_word:
+                candidates.append((word[:depth], node.weight))
+            candidates.sort(key=lambda entry: -entry[1])
+            node.top = candidates[:self.top_k]
+
+import sys
+
+INTERN_MAX_LABEL = 16   # short labels repeat across the tree, long ones are mostly unique text
+
+class RadixNode:
+    __slots__ = ("label", "children", "count")
+
+    def __init__(self, label, count=0):
+        self.label = label      # edge label leading into this node
+        self.children = None    # {first char of child label: child}, created on first child
+        self.count = count      # number of times the word ending here was inserted
+
+class RadixTrie:
+    """
+    Compressed Trie for long, mostly unique strings such as comment bodies:
+    every single-child chain is one node holding the whole edge label, so a
+    stored word costs a handful of nodes instead of one node and dict per
+    character. Same insert/search/remove API as Trie, without ranking.
+    """
+
+    def __init__(self):
+        self.root = RadixNode("")
+
+    def clear(self):
+        self.root = RadixNode("")
+
+    @staticmethod
+    def _label(text):
+        return sys.intern(text) if len(text) <= INTERN_MAX_LABEL else text
+
+    def insert(self, word):
+        node = self.root
+        i = 0
+        while i < len(word):
+            child = node.children.get(word[i]) if node.children else None
+            if child is None:
+                if node.children is None:
+                    node.children = {}
+                node.children[word[i]] = RadixNode(self._label(word[i:]), 1)
+                return
+            label = child.label
+            if word.startswith(label, i):
+                node = child
+                i += len(label)
+                continue
+            # Split the edge at the end of the shared prefix
+            common = 1
+            while common < len(label) and i + common < len(word) and label[common] == word[i + common]:
+                common += 1
+            middle = RadixNode(self._label(label[:common]))
+            child.label = self._label(label[common:])
+            middle.children = {child.label[0]: child}
+            node.children[word[i]] = middle
+            node = middle
+            i += common
+        node.count += 1
+
+    def search(self, word):
+        node = self._find(word)
+        return node is not None and node.count > 0
+
+    def remove(self, word):
+        path = [self.root]
+        node = self.root
+        i = 0
+        while i < len(word):
+            node = node.children.get(word[i]) if node.children else None
+            if node is None or not word.startswith(node.label, i):
+                return False
+            path.append(node)
+            i += len(node.label)
+        if node.count == 0:
+            return False
+        node.count -= 1
+        if node.count == 0 and node is not self.root:
+            parent = path[-2]
+            if not node.children:
+                del parent.children[node.label[0]]
+                if not parent.children:
+                    parent.children = None
+                node = parent
+                parent = path[-3] if len(path) > 2 else None
+            # Re-compress a node left with no word and a single child
+            if parent is not None and node.count == 0 and node.children and len(node.children) == 1:
+                (child,) = node.children.values()
+                child.label = self._label(node.label + child.label)
+                parent.children[child.label[0]] = child
+        return True
+
+    def _find(self, word):
+        node = self.root
+        i = 0
+        while i < len(word):
+            node = node.children.get(word[i]) if node.children else None
+            if node is None or not word.startswith(node.label, i):
+                return None
+            i += len(node.label)
+        return node
+
 import heapq
 
 class Heap:
@@ -33,4 +215,138 @@ class Heap:
         heapq.heappush(self.heap, item)
 
     def pop(self):
-        return heapq.heappop(self.heap)
\ No newline at end of file
+        return heapq.heappop(self.heap)
+
+    def clear(self):
+        self.heap = []
+
+class IndexedHeap:
+    """
+    Min-heap of (key, id) entries with an id -> position index, so an entry
+    can be re-keyed or removed in O(log n). With a capacity it keeps only the
+    entries with the largest keys: once full, a new entry evicts the root if
+    its key is larger and is dropped otherwise.
+    """
+
+    def __init__(self, capacity=None):
+        self.capacity = capacity
+        self.heap = []
+        self.position = {}
+
+    def __len__(self):
+        return len(self.heap)
+
+    def __contains__(self, id):
+        return id in self.position
+
+    def clear(self):
+        self.heap = []
+        self.position = {}
+
+    def push(self, id, key):
+        if id in self.position:
+            self.update(id, key)
+            return True
+        if self.capacity is not None and len(self.heap) >= self.capacity:
+            if not self.heap or (key, id) <= self.heap[0]:
+                return False
+            self._remove_at(0)
+        self.heap.append((key, id))
+        self.position[id] = len(self.heap) - 1
+        self._sift_up(len(self.heap) - 1)
+        return True
+
+    def update(self, id, key):
+        i = self.position[id]
+        old = self.heap[i]
+        self.heap[i] = (key, id)
+        if self.heap[i] < old:
+            self._sift_up(i)
+        else:
+            self._sift_down(i)
+
+    def remove(self, id):
+        i = self.position.get(id)
+        if i is None:
+            return False
+        self._remove_at(i)
+        return True
+
+    def pop(self):
+        key, id = self.heap[0]
+        self._remove_at(0)
+        return id, key
+
+    def largest(self, n):
+        # [(id, key)] for the n largest keys, largest first
+        return [(id, key) for key, id in heapq.nlargest(n, self.heap)]
+
+    def _remove_at(self, i):
+        del self.position[self.heap[i][1]]
+        last = self.heap.pop()
+        if i < len(self.heap):
+            self.heap[i] = last
+            self.position[last[1]] = i
+            self._sift_up(i)
+            self._sift_down(self.position[last[1]])
+
+    def _swap(self, i, j):
+        self.heap[i], self.heap[j] = self.heap[j], self.heap[i]
+        self.position[self.heap[i][1]] = i
+        self.position[self.heap[j][1]] = j
+
+    def _sift_up(self, i):
+        while i > 0:
+            parent = (i - 1) // 2
+            if self.heap[i] >= self.heap[parent]:
+                break
+            self._swap(i, parent)
+            i = parent
+
+    def _sift_down(self, i):
+        size = len(self.heap)
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < size and self.heap[child] < self.heap[smallest]:
+                    smallest = child
+            if smallest == i:
+                return
+            self._swap(i, smallest)
+            i = smallest
+
+import hashlib
+import math
+
+class BloomFilter:
+    """
+    Set membership test in a fixed bit array: `item in bloom` is always True
+    for added items and True for about error_rate of the others, never a
+    false negative. Items cannot be removed, build a new filter instead.
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, item):
+        return all(self.bits[i >> 3] & (1 << (i & 7)) for i in self._positions(item))
+
+    def add(self, item):
+        for i in self._positions(item):
+            self.bits[i >> 3] |= 1 << (i & 7)
+        self.count += 1
+
+    def _positions(self, item):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
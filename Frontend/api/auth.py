@@ -1,8 +1,10 @@
 # Authentication API functions
 
+import time
 import streamlit as st
 import requests
 from config import AUTH_URL
+from api.realtime import close_notification_stream
 
 def login(username, password):
     """
@@ -14,8 +16,7 @@ def login(username, password):
             data={"username": username, "password": password}
         )
         if response.status_code == 200:
-            data = response.json()
-            st.session_state.token = data["access_token"]
+            store_tokens(response.json())
             st.session_state.user = username
             st.session_state.current_page = 'home'
             st.rerun()  # Add rerun after successful login
@@ -27,6 +28,36 @@ def login(username, password):
         st.error(f"Login error: {str(e)}")
         return False
 
+def store_tokens(data):
+    """
+    Keep the token pair returned by /auth/token or /auth/refresh in the session
+    """
+    st.session_state.token = data["access_token"]
+    st.session_state.refresh_token = data.get("refresh_token")
+    st.session_state.token_expires_at = time.time() + data.get("expires_in", 0)
+
+def ensure_fresh_token(margin=60):
+    """
+    Swap the refresh token for a new pair shortly before the access token expires,
+    so long sessions never ask for the password again
+    """
+    if not st.session_state.get("refresh_token"):
+        return
+    if time.time() < st.session_state.get("token_expires_at", 0) - margin:
+        return
+    try:
+        response = requests.post(
+            f"{AUTH_URL}/refresh",
+            json={"refresh_token": st.session_state.refresh_token}
+        )
+        if response.status_code == 200:
+            store_tokens(response.json())
+        else:
+            st.warning("Your session has expired, please log in again")
+            logout()
+    except Exception as e:
+        st.error(f"Session refresh error: {str(e)}")
+
 def register(username, email, password):
     """
     Register a new user account
@@ -72,8 +103,21 @@ def logout():
     """
     Clear session state and log the user out
     """
+    close_notification_stream()
+    if st.session_state.get("token"):
+        try:
+            # Revoke both tokens so they stop working before they expire
+            requests.post(
+                f"{AUTH_URL}/logout",
+                json={"refresh_token": st.session_state.get("refresh_token")},
+                headers={"Authorization": f"Bearer {st.session_state.token}"}
+            )
+        except Exception:
+            pass
     st.session_state.user = None
     st.session_state.token = None
+    st.session_state.refresh_token = None
+    st.session_state.token_expires_at = 0
     st.session_state.current_page = 'login'
     st.session_state.notifications = []
     st.session_state.topics = []
@@ -13,26 +13,47 @@ from datetime import datetime
 transport = RequestsHTTPTransport(url=GRAPHQL_URL)
 client = Client(transport=transport, fetch_schema_from_transport=True)
 
-def search_topics(prefix):
+def suggest_titles(prefix, k=5):
     """
-    Search for topics with a title matching the given prefix
+    Autocomplete topic titles starting with the given prefix, most popular first
     """
     try:
         query = gql_query("""
-        query GetTopics($prefix: String!) {
-          topic(prefix: $prefix) {
-            id
-            title
-            content
-            userId
+        query Suggest($prefix: String!, $k: Int!) {
+          suggest(prefix: $prefix, k: $k)
+        }
+        """)
+        result = client.execute(query, variable_values={"prefix": prefix, "k": k})
+        return result["suggest"]
+    except Exception as e:
+        st.error(f"Error fetching suggestions: {str(e)}")
+        return []
+
+def full_text_search(query_text, first=10, offset=0):
+    """
+    Full-text search over topics, ranked by relevance with highlighted snippets
+    Returns a dict with "results" and the "nextOffset" of the following page
+    """
+    try:
+        query = gql_query("""
+        query Search($query: String!, $first: Int!, $offset: Int!) {
+          search(query: $query, first: $first, offset: $offset) {
+            results {
+              id
+              title
+              titleHighlight
+              snippet
+              userId
+            }
+            nextOffset
           }
         }
         """)
-        result = client.execute(query, variable_values={"prefix": prefix})
-        return result["topic"]
+        result = client.execute(query, variable_values={"query": query_text, "first": first, "offset": offset})
+        return result["search"]
     except Exception as e:
         st.error(f"Error searching topics: {str(e)}")
-        return []
+        return {"results": [], "nextOffset": None}
 
 def get_trending_topics(limit=10):
     """
@@ -102,30 +123,75 @@ def get_user_details(username: str) -> dict:
 #         st.error(f"Error updating profile image: {str(e)}")
 #         return False
 
-def get_topic_comments(topic_id: int) -> list:
+def get_user_posts(username: str, comments_first: int = 5) -> list:
     """
-    Fetch comments for a specific topic using GraphQL
+    Fetch a user's topics together with the first page of their comments and comment authors in one query
     """
     try:
         query = gql_query("""
-        query getComment($topicId: Int!) {
-          comment(topicId: $topicId) {
-            id
-            content
-            userId
+        query GetUserPosts($username: String!, $commentsFirst: Int!) {
+          user(username: $username) {
+            topics {
+              id
+              title
+              content
+              comments(first: $commentsFirst) {
+                totalCount
+                pageInfo {
+                  hasNextPage
+                  endCursor
+                }
+                edges {
+                  node {
+                    id
+                    content
+                    userId
+                    author {
+                      name
+                    }
+                  }
+                }
+              }
+            }
           }
         }
         """)
-        result = client.execute(query, variable_values={"topicId": topic_id})
-        comment = result.get("comment")
-        if comment:
-          return[comment]
-        else:
-          return []
-      
+        result = client.execute(query, variable_values={"username": username, "commentsFirst": comments_first})
+        user = result.get("user")
+        return user["topics"] if user else []
     except Exception as e:
-        st.error(f"Error fetching comments: {str(e)}")
+        st.error(f"Error fetching posts: {str(e)}")
         return []
 
-
-
+def get_topic_comments(topic_id: int, first: int = 20, after: str = None) -> dict:
+    """
+    Fetch one page of a topic's comments using GraphQL
+    Pass the returned pageInfo.endCursor as `after` for the next page
+    """
+    try:
+        query = gql_query("""
+        query GetComments($topicId: Int!, $first: Int!, $after: String) {
+          comments(topicId: $topicId, first: $first, after: $after) {
+            totalCount
+            pageInfo {
+              hasNextPage
+              endCursor
+            }
+            edges {
+              node {
+                id
+                content
+                userId
+                author {
+                  name
+                }
+              }
+            }
+          }
+        }
+        """)
+        result = client.execute(query, variable_values={"topicId": topic_id, "first": first, "after": after})
+        return result["comments"]
+    except Exception as e:
+        st.error(f"Error fetching comments: {str(e)}")
+        return {"totalCount": 0, "pageInfo": {"hasNextPage": False, "endCursor": None}, "edges": []}
@@ -0,0 +1,63 @@
+# forum_app/api/realtime.py
+# WebSocket client for pushed notifications
+
+import json
+import threading
+import streamlit as st
+import websocket
+from config import WS_URL
+
+class NotificationStream:
+    """
+    Keep a WebSocket open to the backend in a background thread and track the
+    unread notification count it pushes, so reruns never have to poll the API
+    """
+
+    def __init__(self, token):
+        self.token = token
+        self.unread_count = 0
+        self.recent = []
+        self._lock = threading.Lock()
+        self._socket = websocket.WebSocketApp(
+            f"{WS_URL}/notifications?token={token}",
+            on_message=self._on_message,
+        )
+        self._thread = threading.Thread(
+            target=self._socket.run_forever,
+            kwargs={"ping_interval": 30, "reconnect": 5},
+            daemon=True,
+        )
+        self._thread.start()
+
+    def _on_message(self, _socket, raw):
+        event = json.loads(raw)
+        with self._lock:
+            if event["type"] == "unread_count":
+                self.unread_count = event["count"]
+            elif event["type"] == "notification":
+                self.unread_count += 1
+                self.recent.insert(0, event["notification"])
+                del self.recent[20:]
+
+    def close(self):
+        self._socket.close()
+
+def get_notification_stream():
+    """
+    Return the notification stream for the logged in user, opening it on first use
+    """
+    stream = st.session_state.get("notification_stream")
+    if stream is None or stream.token != st.session_state.token:
+        if stream is not None:
+            stream.close()
+        stream = NotificationStream(st.session_state.token)
+        st.session_state.notification_stream = stream
+    return stream
+
+def close_notification_stream():
+    """
+    Close the notification stream when the user logs out
+    """
+    stream = st.session_state.pop("notification_stream", None)
+    if stream is not None:
+        stream.close()
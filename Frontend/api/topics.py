@@ -63,31 +63,52 @@ def get_user_topics(username):
         st.error(f"Error fetching topics: {str(e)}")
         return []
 
-def get_notifications():
+def get_notifications(after=None, limit=20):
     """
-    Get all unread notifications for the current user
+    Get one page of unread notifications for the current user
+    Returns a dict with "notifications" and the "next_cursor" to pass as `after`
     """
     try:
         response = requests.get(
             f"{API_URL}/notifications",
+            params={"after": after, "limit": limit},
             headers={"Authorization": f"Bearer {st.session_state.token}"}
         )
         if response.status_code == 200:
             return response.json()
         else:
             st.error(f"Failed to fetch notifications: {response.json().get('detail', 'Unknown error')}")
-            return []
+            return {"notifications": [], "next_cursor": None}
     except Exception as e:
         st.error(f"Error fetching notifications: {str(e)}")
-        return []
+        return {"notifications": [], "next_cursor": None}
     
-def mark_notification_as_read():
+def get_notification_count():
     """
-    Mark a notification as read
+    Get the unread count and latest notification id for the current user
     """
     try:
         response = requests.get(
+            f"{API_URL}/notifications/count",
+            headers={"Authorization": f"Bearer {st.session_state.token}"}
+        )
+        if response.status_code == 200:
+            return response.json()
+        else:
+            st.error(f"Failed to fetch notification count: {response.json().get('detail', 'Unknown error')}")
+            return {"unread_count": 0, "latest_id": None}
+    except Exception as e:
+        st.error(f"Error fetching notification count: {str(e)}")
+        return {"unread_count": 0, "latest_id": None}
+    
+def mark_notification_as_read(notification_id=None):
+    """
+    Mark a notification as read, or all unread notifications when no id is given
+    """
+    try:
+        response = requests.post(
             f"{API_URL}/notifications/mark-read",
+            json={"ids": [notification_id]} if notification_id is not None else {},
             headers={"Authorization": f"Bearer {st.session_state.token}"}
         )
         if response.status_code == 200:
@@ -101,23 +122,25 @@ def mark_notification_as_read():
         return False
 
 
-def get_all_notifications():
+def get_all_notifications(after=None, limit=20):
     """
-    Get all notifications (both read and unread) for the current user
+    Get one page of notifications (both read and unread) for the current user
+    Returns a dict with "notifications" and the "next_cursor" to pass as `after`
     """
     try:
         response = requests.get(
             f"{API_URL}/notifications/all",  # Note: Fix the missing slash in the API endpoint
+            params={"after": after, "limit": limit},
             headers={"Authorization": f"Bearer {st.session_state.token}"}
         )
         if response.status_code == 200:
             return response.json()
         else:
             st.error(f"Failed to fetch all notifications: {response.json().get('detail', 'Unknown error')}")
-            return []
+            return {"notifications": [], "next_cursor": None}
     except Exception as e:
         st.error(f"Error fetching all notifications: {str(e)}")
-        return []
+        return {"notifications": [], "next_cursor": None}
 
 def delete_topic(topic_id: str) -> bool:
     """
@@ -8,16 +8,34 @@ from pages.search import render_search_page
 from pages.my_posts import render_my_posts_page
 from pages.notifications import render_notifications_page
 from pages.profile import render_profile_page
-from api.auth import logout
-from api.topics import get_notifications
+from api.auth import logout, ensure_fresh_token
+from api.realtime import get_notification_stream
 
 # Add this at the start of your main.py or app.py
 if 'show_create_form' not in st.session_state:
     st.session_state.show_create_form = False
 
+@st.fragment(run_every="5s")
+def render_notification_button():
+    """
+    Render the notifications button, refreshed from the pushed unread count
+    """
+    notification_count = get_notification_stream().unread_count
+    
+    if notification_count > 0:
+        if st.button(f"🔔 Notifications ({notification_count})"):
+            st.session_state.current_page = 'notifications'
+            st.rerun()
+    else:
+        if st.button("🔔 Notifications"):
+            st.session_state.current_page = 'notifications'
+            st.rerun()
+
 def main():
     # Initialize session state
     init_session_state()
+    if st.session_state.token:
+        ensure_fresh_token()
         
         
             
@@ -40,18 +58,9 @@ def main():
             st.session_state.current_page = 'my_posts'
             st.rerun()
             
-        # Notifications button with count
-        notifications = get_notifications()
-        notification_count = len(notifications)
-        
-        if notification_count > 0:
-            if st.sidebar.button(f"🔔 Notifications ({notification_count})"):
-                st.session_state.current_page = 'notifications'
-                st.rerun()
-        else:
-            if st.sidebar.button("🔔 Notifications"):
-                st.session_state.current_page = 'notifications'
-                st.rerun()
+        # Notifications button with count pushed over the WebSocket
+        with st.sidebar:
+            render_notification_button()
             
         if st.sidebar.button("👤 Profile"):
             st.session_state.current_page = 'profile'
@@ -1,4 +1,5 @@
 # API endpoints
 API_URL = "http://localhost:8000/api"
 AUTH_URL = "http://localhost:8000/auth"
-GRAPHQL_URL = "http://localhost:8000/graphql"
\ No newline at end of file
+GRAPHQL_URL = "http://localhost:8000/graphql"
+WS_URL = "ws://localhost:8000/ws"
\ No newline at end of file
@@ -1,8 +1,8 @@
 # User's posts page
 
 import streamlit as st
-from api.topics import get_user_topics, update_topic, create_topic, delete_topic
-from api.graphql import get_topic_comments
+from api.topics import update_topic, create_topic, delete_topic
+from api.graphql import get_user_posts, get_topic_comments
 
 def render_my_posts_page():
     """
@@ -95,8 +95,8 @@ def render_my_posts_page():
                 else:
                     st.warning("⚠️ Please provide both title and content")
 
-    # Fetch and display user's topics
-    user_topics = get_user_topics(st.session_state.user)
+    # Fetch the user's topics with their comments in a single GraphQL request
+    user_topics = get_user_posts(st.session_state.user)
     st.session_state.topics = user_topics
 
     if st.session_state.topics:
@@ -118,8 +118,6 @@ def render_my_posts_page():
                 with col2:
                     if st.button("💬", key=f"comments_{topic['id']}", help="Show comments"):
                         st.session_state[f"show_comments_{topic['id']}"] = True
-                        if f"topic_comments_{topic['id']}" not in st.session_state:
-                            st.session_state[f"topic_comments_{topic['id']}"] = get_topic_comments(topic['id'])
                 with col3:
                     if st.button("🗑️", key=f"delete_{topic['id']}", help="Delete post"):
                         if delete_topic(topic['id']):
@@ -131,16 +129,31 @@ def render_my_posts_page():
                     st.markdown('<div class="comment-section">', unsafe_allow_html=True)
                     st.markdown("### 💬 Comments")
                     
-                    comments = st.session_state.get(f"topic_comments_{topic['id']}", get_topic_comments(topic['id']))
+                    # The first page comes with the topic, later pages are fetched on demand
+                    first_page = topic['comments']
+                    comments = [edge['node'] for edge in first_page['edges']]
+                    page_info = st.session_state.get(f"comments_page_{topic['id']}", first_page['pageInfo'])
+                    comments += st.session_state.get(f"more_comments_{topic['id']}", [])
                     
                     if comments:
                         for comment in comments:
                             st.markdown(f'''
                             <div class="comment-box">
-                                <strong>@{comment['userId']}</strong><br>
+                                <strong>@{comment['author']['name'] if comment['author'] else comment['userId']}</strong><br>
                                 {comment['content']}
                             </div>
                             ''', unsafe_allow_html=True)
+                        if page_info['hasNextPage']:
+                            remaining = first_page['totalCount'] - len(comments)
+                            label = f"Load more comments ({remaining})" if remaining > 0 else "Load more comments"
+                            if st.button(label, key=f"more_{topic['id']}"):
+                                page = get_topic_comments(topic['id'], after=page_info['endCursor'])
+                                st.session_state[f"more_comments_{topic['id']}"] = (
+                                    st.session_state.get(f"more_comments_{topic['id']}", [])
+                                    + [edge['node'] for edge in page['edges']]
+                                )
+                                st.session_state[f"comments_page_{topic['id']}"] = page['pageInfo']
+                                st.rerun()
                     else:
                         st.info("💭 No comments yet. Be the first to comment!")
                     st.markdown('</div>', unsafe_allow_html=True)
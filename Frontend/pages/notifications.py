@@ -1,7 +1,31 @@
 # Notifications page
 
 import streamlit as st
-from api.topics import get_notifications, mark_notification_as_read, get_all_notifications
+from api.topics import get_notifications, mark_notification_as_read, get_all_notifications, get_notification_count
+
+def load_notifications_page(show_all):
+    """
+    Fetch the next page of notifications and append it to the loaded list
+    """
+    loaded = st.session_state.loaded_notifications
+    fetch = get_all_notifications if show_all else get_notifications
+    page = fetch(after=loaded["next_cursor"])
+    loaded["items"].extend(page["notifications"])
+    loaded["next_cursor"] = page["next_cursor"]
+    loaded["complete"] = page["next_cursor"] is None
+
+def reset_loaded_notifications(show_all, latest_id=None, unread_count=None):
+    """
+    Forget loaded pages so the list is fetched again from the first page
+    """
+    st.session_state.loaded_notifications = {
+        "show_all": show_all,
+        "latest_id": latest_id,
+        "unread_count": unread_count,
+        "items": [],
+        "next_cursor": None,
+        "complete": False,
+    }
 
 def render_notifications_page():
     """
@@ -48,17 +72,31 @@ def render_notifications_page():
         # Update session state when checkbox changes
         if show_all != st.session_state.show_all_notifications:
             st.session_state.show_all_notifications = show_all
+    
+    # Pages are fetched on demand and kept across reruns. The count endpoint is
+    # answered from Redis, so the list is only fetched again when it changed.
+    count = get_notification_count()
+    loaded = st.session_state.get('loaded_notifications')
+    if (loaded is None
+            or loaded["show_all"] != st.session_state.show_all_notifications
+            or loaded["latest_id"] != count["latest_id"]
+            or loaded["unread_count"] != count["unread_count"]):
+        reset_loaded_notifications(st.session_state.show_all_notifications, count["latest_id"], count["unread_count"])
+    loaded = st.session_state.loaded_notifications
+    if not st.session_state.show_all_notifications and count["unread_count"] == 0:
+        loaded["complete"] = True
+    if not loaded["items"] and not loaded["complete"]:
+        load_notifications_page(st.session_state.show_all_notifications)
+    notifications = st.session_state.loaded_notifications["items"]
             
-    if st.session_state.show_all_notifications:
-        notifications = get_all_notifications()
-        if not notifications:
-            st.info("No notifications history")
-            return  
-    else:
-        notifications = get_notifications()
-        if not notifications:
-            st.info("No notifications")
-            return
+    if not notifications:
+        st.info("No notifications history" if st.session_state.show_all_notifications else "No notifications")
+        return
+    
+    if count["unread_count"] > 0:
+        if st.button("✓ Mark all as read"):
+            if mark_notification_as_read():
+                st.rerun()
     
     # Display notifications with conditional mark as read button
     for notification in notifications:
@@ -79,6 +117,11 @@ def render_notifications_page():
             # Only show mark as read button for unread notifications
             if not notification.get('is_read'):
                 if st.button("Mark as read", key=f"mark_read_{notification['id']}"):
-                    if mark_notification_as_read():
+                    if mark_notification_as_read(notification['id']):
                         st.success("Marked as read")
-                        st.rerun()
\ No newline at end of file
+                        st.rerun()
+    
+    if not st.session_state.loaded_notifications["complete"]:
+        if st.button("Load more"):
+            load_notifications_page(st.session_state.show_all_notifications)
+            st.rerun()
\ No newline at end of file
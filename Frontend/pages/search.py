@@ -1,7 +1,7 @@
 # Search page
 
 import streamlit as st
-from api.graphql import search_topics
+from api.graphql import full_text_search, suggest_titles
 from api.comments import add_comment
 
 def render_search_page():
@@ -73,23 +73,31 @@ def render_search_page():
             search_button = st.button("🔍 Search")
         st.markdown('</div>', unsafe_allow_html=True)
 
+        # Title autocomplete, answered from the backend's in-memory index
+        if search_query and not search_button:
+            suggestions = suggest_titles(search_query)
+            if suggestions:
+                st.caption("Suggestions: " + " · ".join(suggestions))
+
         if search_button:
             if search_query:
                 with st.spinner('Searching...'):
-                    search_results = search_topics(search_query)
-                    st.session_state.search_results = search_results
+                    page = full_text_search(search_query)
+                    st.session_state.search_results = page["results"]
+                    st.session_state.search_next_offset = page["nextOffset"]
+                    st.session_state.search_query = search_query
             else:
                 st.warning("⚠️ Please enter a search term")
 
     # Display search results
     if hasattr(st.session_state, 'search_results') and st.session_state.search_results:
-        st.markdown(f'### 📚 Found {len(st.session_state.search_results)} results')
+        st.markdown(f'### 📚 Showing {len(st.session_state.search_results)} results')
         for topic in st.session_state.search_results:
             with st.expander(f"📄 {topic['title']}", expanded=True):
                 st.markdown(f'''
                     <div class="result-card">
-                        <div class="topic-title">{topic['title']}</div>
-                        <div class="topic-content">{topic['content']}</div>
+                        <div class="topic-title">{topic['titleHighlight']}</div>
+                        <div class="topic-content">{topic['snippet']}</div>
                     </div>
                 ''', unsafe_allow_html=True)
                 
@@ -109,5 +117,13 @@ def render_search_page():
                             else:
                                 st.error("❌ Failed to post comment")
                 st.markdown('</div>', unsafe_allow_html=True)
+        
+        # Fetch the next page of ranked results on demand
+        if st.session_state.get('search_next_offset') is not None:
+            if st.button("Load more results"):
+                page = full_text_search(st.session_state.search_query, offset=st.session_state.search_next_offset)
+                st.session_state.search_results.extend(page["results"])
+                st.session_state.search_next_offset = page["nextOffset"]
+                st.rerun()
     elif search_query:
         st.info("👀 No results found. Try different keywords!")
\ No newline at end of file
@@ -8,6 +8,10 @@ def init_session_state():
         st.session_state.user = None
     if 'token' not in st.session_state:
         st.session_state.token = None
+    if 'refresh_token' not in st.session_state:
+        st.session_state.refresh_token = None
+    if 'token_expires_at' not in st.session_state:
+        st.session_state.token_expires_at = 0
     if 'current_page' not in st.session_state:
         st.session_state.current_page = 'login'
     if 'notifications' not in st.session_state: